@@ -0,0 +1,109 @@
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import models
+from .config import settings
+from .database import insert_ignoring_conflicts
+
+def _performer(attempt) -> dict:
+    """Build a top performer entry from an attempt."""
+    return {
+        "student_name": attempt.student_name,
+        "roll_no": attempt.roll_no,
+        "score": attempt.score
+    }
+
+def record_attempt(db: Session, class_id: int, attempt: models.StudentAttempt) -> None:
+    """Fold a new attempt into the class aggregates. The caller commits."""
+    # Increment in SQL first: it takes the write lock, so concurrent
+    # submissions serialize here instead of losing updates
+    increment = update(models.ClassPerformance).where(
+        models.ClassPerformance.class_id == class_id
+    ).values(
+        attempt_count=models.ClassPerformance.attempt_count + 1,
+        score_sum=models.ClassPerformance.score_sum + attempt.score
+    ).execution_options(synchronize_session=False)
+
+    if db.execute(increment).rowcount == 0:
+        # First attempt of the class: create an empty row, skipping it if a
+        # concurrent first submission already did, then count into it
+        try:
+            with db.begin_nested():
+                db.execute(
+                    insert_ignoring_conflicts(models.ClassPerformance, ["class_id"]).values(
+                        class_id=class_id,
+                        attempt_count=0,
+                        score_sum=0,
+                        top_performers=[]
+                    )
+                )
+        except IntegrityError:
+            pass
+        db.execute(increment)
+
+    aggregate = db.query(models.ClassPerformance).filter(
+        models.ClassPerformance.class_id == class_id
+    ).populate_existing().first()
+
+    # Earlier attempts win ties, matching a stable sort over attempt order
+    top_performers = list(aggregate.top_performers or [])
+    position = len(top_performers)
+    while position > 0 and top_performers[position - 1]["score"] < attempt.score:
+        position -= 1
+    if position < settings.PERFORMANCE_TOP_K:
+        top_performers.insert(position, _performer(attempt))
+        # Assign a new list so the JSON column is flagged as modified
+        aggregate.top_performers = top_performers[:settings.PERFORMANCE_TOP_K]
+
+def performance_stats(aggregate) -> dict:
+    """Generate performance statistics from a class aggregate row."""
+    if not aggregate or not aggregate.attempt_count:
+        return {
+            "average_score": 0,
+            "total_students": 0,
+            "top_performers": []
+        }
+
+    return {
+        "average_score": round(aggregate.score_sum / aggregate.attempt_count, 2),
+        "total_students": aggregate.attempt_count,
+        "top_performers": (aggregate.top_performers or [])[:3]
+    }
+
+def rebuild_class_performance(db: Session) -> int:
+    """Recompute every class aggregate from student_attempts. Returns the number of classes."""
+    totals = db.query(
+        models.Test.class_id,
+        func.count(models.StudentAttempt.id),
+        func.coalesce(func.sum(models.StudentAttempt.score), 0)
+    ).join(
+        models.StudentAttempt, models.StudentAttempt.test_id == models.Test.id
+    ).group_by(models.Test.class_id).all()
+
+    db.query(models.ClassPerformance).delete(synchronize_session=False)
+
+    for class_id, attempt_count, score_sum in totals:
+        top_attempts = db.query(models.StudentAttempt).join(
+            models.Test
+        ).filter(
+            models.Test.class_id == class_id
+        ).order_by(
+            models.StudentAttempt.score.desc(),
+            models.StudentAttempt.id
+        ).limit(settings.PERFORMANCE_TOP_K).all()
+
+        db.add(models.ClassPerformance(
+            class_id=class_id,
+            attempt_count=attempt_count,
+            score_sum=score_sum,
+            top_performers=[_performer(a) for a in top_attempts]
+        ))
+
+    db.commit()
+    return len(totals)
+
+if __name__ == "__main__":
+    # Kept for existing scripts; prefer python -m app.manage rebuild-aggregates
+    from .manage import main
+
+    main(["rebuild-aggregates"])
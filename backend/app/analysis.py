@@ -0,0 +1,111 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from . import models
+from .answers import iter_answer_vectors
+from .cache import VersionedCache
+from .config import settings
+
+# Item analysis per test: (attempt_count, last_attempt_id, report)
+item_analysis_cache = VersionedCache("item_analysis", settings.TEST_CACHE_SIZE)
+
+# Marker for a question the student left unanswered
+UNANSWERED = -1
+
+def load_answer_matrix(db: Session, test_id: int) -> Tuple[List[models.Question], np.ndarray]:
+    """Load a test's attempts as an (attempts x questions) matrix of chosen option indices."""
+    questions = db.query(models.Question).filter(
+        models.Question.test_id == test_id
+    ).order_by(models.Question.id).all()
+    vectors = [vector for _, vector in iter_answer_vectors(db, test_id, [q.id for q in questions])]
+    packed = np.frombuffer(b"".join(vectors), dtype=np.uint8).reshape(len(vectors), len(questions))
+
+    # Out-of-range choices (and the packed unanswered byte) cannot be correct
+    option_counts = np.array([len(q.options or []) for q in questions], dtype=np.int16)
+    matrix = packed.astype(np.int16)
+    matrix[matrix >= option_counts] = UNANSWERED
+    return questions, matrix
+
+def _nullable(values: np.ndarray, digits: int = 4) -> List[Optional[float]]:
+    """Round floats for JSON, mapping NaN to None."""
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+def analyze_items(questions: List[models.Question], answers: np.ndarray) -> dict:
+    """Compute difficulty, discrimination and distractor statistics for every question."""
+    n_attempts, n_questions = answers.shape
+    key = np.array([q.correct_option for q in questions], dtype=np.int16)
+    correct = (answers == key).astype(np.float64)
+    totals = correct.sum(axis=1)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Difficulty: share of students answering each question correctly
+        difficulty = correct.mean(axis=0) if n_attempts else np.full(n_questions, np.nan)
+
+        # Discrimination: point-biserial correlation of each item with the
+        # rest score (total minus the item itself), all items at once
+        rest = totals[:, None] - correct
+        covariance = (correct * rest).mean(axis=0) - difficulty * rest.mean(axis=0)
+        item_sd = np.sqrt(difficulty * (1 - difficulty))
+        rest_sd = rest.std(axis=0)
+        discrimination = covariance / (item_sd * rest_sd)
+
+        # Distractors: how many students chose each option and their mean
+        # total, from one bincount over (option, question) cells
+        n_slots = max([len(q.options or []) for q in questions] + [0]) + 1
+        cells = ((answers.astype(np.int64) - UNANSWERED) * n_questions + np.arange(n_questions)).ravel()
+        counts = np.bincount(cells, minlength=n_slots * n_questions).reshape(n_slots, n_questions)
+        score_sums = np.bincount(
+            cells,
+            weights=np.repeat(totals, n_questions),
+            minlength=n_slots * n_questions
+        ).reshape(n_slots, n_questions)
+        mean_totals = score_sums / counts
+
+    items = []
+    for j, question in enumerate(questions):
+        options = []
+        for k in range(len(question.options or [])):
+            options.append({
+                "option": k,
+                "text": question.options[k],
+                "is_correct": k == question.correct_option,
+                "count": int(counts[k + 1, j]),
+                "share": round(float(counts[k + 1, j]) / n_attempts, 4) if n_attempts else 0.0,
+                "mean_total_score": _nullable(mean_totals[k + 1, j:j + 1], 2)[0]
+            })
+        items.append({
+            "question_id": question.id,
+            "question_text": question.question_text,
+            "difficulty": _nullable(difficulty[j:j + 1])[0],
+            "discrimination": _nullable(discrimination[j:j + 1])[0],
+            "unanswered": int(counts[0, j]),
+            "options": options
+        })
+
+    return {
+        "attempts": n_attempts,
+        "questions": n_questions,
+        "mean_score": round(float(totals.mean()), 2) if n_attempts else 0,
+        "items": items
+    }
+
+def get_item_analysis(db: Session, test_id: int, version: int) -> dict:
+    """Get the item analysis of a test, recomputing only when questions or attempts changed."""
+    attempt_count, last_attempt_id = db.query(
+        func.count(models.StudentAttempt.id),
+        func.max(models.StudentAttempt.id)
+    ).filter(models.StudentAttempt.test_id == test_id).one()
+
+    def compute():
+        questions, answers = load_answer_matrix(db, test_id)
+        return attempt_count, last_attempt_id, analyze_items(questions, answers)
+
+    # New submissions do not bump the test version, so also check the attempts
+    cached = item_analysis_cache.get_or_load(
+        test_id,
+        version,
+        compute,
+        is_fresh=lambda value: value[:2] == (attempt_count, last_attempt_id)
+    )
+    return {"test_id": test_id, **cached[2]}
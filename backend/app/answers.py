@@ -0,0 +1,94 @@
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session
+from . import models
+
+# Byte stored for a question the student left unanswered. Choices that do not
+# fit in a byte can never be correct and are stored the same way.
+UNANSWERED = 0xFF
+
+# Answer vectors hold one byte per question, in ascending question id order.
+# Questions are only ever appended, so a question added after an attempt sorts
+# past the end of that attempt's vector and reads as unanswered.
+
+def pack_answers(answers: Dict[str, int], question_ids: Sequence) -> bytes:
+    """Pack {str(question_id): option} into one byte per question."""
+    return bytes(
+        option if isinstance(option, int) and 0 <= option < UNANSWERED else UNANSWERED
+        for option in (answers.get(str(question_id)) for question_id in question_ids)
+    )
+
+def unpack_answers(vector: bytes, question_ids: Sequence) -> Dict[str, int]:
+    """Expand a packed answer vector back to {str(question_id): option}."""
+    return {
+        str(question_id): option
+        for question_id, option in zip(question_ids, vector)
+        if option != UNANSWERED
+    }
+
+def fit_vector(vector: bytes, length: int) -> bytes:
+    """Pad or trim a vector to the test's current number of questions."""
+    if len(vector) < length:
+        return vector + bytes([UNANSWERED]) * (length - len(vector))
+    return vector[:length]
+
+def question_ids(db: Session, test_id: int) -> List[int]:
+    """Question ids of a test in answer vector order."""
+    rows = db.query(models.Question.id).filter(
+        models.Question.test_id == test_id
+    ).order_by(models.Question.id).all()
+    return [question_id for (question_id,) in rows]
+
+def iter_answer_vectors(
+    db: Session,
+    test_id: int,
+    ids: Optional[List[int]] = None,
+    batch_size: int = 5000
+) -> Iterator[Tuple[int, bytes]]:
+    """Yield (attempt_id, vector) for every attempt of a test, in attempt order.
+
+    Vectors are fitted to the test's current questions. Rows not yet migrated
+    by `python -m app.migrations` are packed from their JSON on the fly.
+    """
+    if ids is None:
+        ids = question_ids(db, test_id)
+
+    rows = db.query(
+        models.StudentAttempt.id,
+        models.StudentAttempt.answer_vector,
+        models.StudentAttempt.answers
+    ).filter(
+        models.StudentAttempt.test_id == test_id
+    ).order_by(models.StudentAttempt.id).yield_per(batch_size)
+
+    for attempt_id, vector, legacy in rows:
+        if vector is None:
+            vector = pack_answers(legacy or {}, ids)
+        yield attempt_id, fit_vector(vector, len(ids))
+
+def pack_legacy_answers(db: Session, batch_size: int = 1000) -> int:
+    """Convert attempts still storing JSON answers to packed vectors."""
+    ids_by_test: Dict[int, List[int]] = {}
+    converted = 0
+    while True:
+        batch = db.query(
+            models.StudentAttempt.id,
+            models.StudentAttempt.test_id,
+            models.StudentAttempt.answers
+        ).filter(
+            models.StudentAttempt.answer_vector.is_(None)
+        ).order_by(models.StudentAttempt.id).limit(batch_size).all()
+        if not batch:
+            return converted
+
+        updates = []
+        for attempt_id, test_id, legacy in batch:
+            if test_id not in ids_by_test:
+                ids_by_test[test_id] = question_ids(db, test_id)
+            updates.append({
+                "id": attempt_id,
+                "answer_vector": pack_answers(legacy or {}, ids_by_test[test_id]),
+                "answers": None
+            })
+        db.bulk_update_mappings(models.StudentAttempt, updates)
+        db.commit()
+        converted += len(batch)
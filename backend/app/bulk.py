@@ -0,0 +1,275 @@
+import csv
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from . import models, schemas, utils
+from .cache import teacher_access_cache
+
+def parse_question_csv(text: str) -> List[dict]:
+    """Parse question rows from CSV.
+
+    Columns are question_text, question_type, media_url, correct_option and
+    one column per option named option_1, option_2, ... in display order.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    option_columns = sorted(
+        (c for c in (reader.fieldnames or []) if c.startswith("option_")),
+        key=lambda c: int(c.split("_", 1)[1]) if c.split("_", 1)[1].isdigit() else 0
+    )
+    rows = []
+    for record in reader:
+        # Keep options by position so correct_option still points at the
+        # right one; only trailing blanks (unused option columns) are dropped
+        options = [record.get(c) or "" for c in option_columns]
+        while options and not options[-1].strip():
+            options.pop()
+        rows.append({
+            "question_text": record.get("question_text"),
+            "question_type": record.get("question_type"),
+            "media_url": record.get("media_url") or None,
+            "correct_option": record.get("correct_option"),
+            "options": options
+        })
+    return rows
+
+def validate_question_rows(rows: List[dict]) -> Tuple[List[schemas.QuestionImport], List[dict]]:
+    """Validate every row in one pass; returns the valid questions and per-row errors."""
+    questions = []
+    errors = []
+    for row_number, row in enumerate(rows, start=1):
+        try:
+            question = schemas.QuestionImport.parse_obj(row)
+        except ValidationError as exc:
+            errors.append({
+                "row": row_number,
+                "errors": [f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in exc.errors()]
+            })
+            continue
+
+        row_errors = []
+        if len(question.options) < 2:
+            row_errors.append("options: at least two options are required")
+        for position, option in enumerate(question.options, start=1):
+            if not option.strip():
+                row_errors.append(f"options: option {position} is blank")
+        if not 0 <= question.correct_option < len(question.options):
+            row_errors.append("correct_option: must index one of the options")
+        if question.media_url and not utils.validate_media_url(question.media_url, question.question_type):
+            row_errors.append(f"media_url: invalid media URL for type {question.question_type}")
+
+        if row_errors:
+            errors.append({"row": row_number, "errors": row_errors})
+        else:
+            questions.append(question)
+    return questions, errors
+
+def _split_names(value) -> List[str]:
+    """Normalize a list of names or a ';'-separated string into stripped names."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(";")
+    if not isinstance(value, list):
+        raise ValueError("expected a list of names or a ';'-separated string")
+    return [str(name).strip() for name in value if str(name).strip()]
+
+def _parse_teacher(entry) -> dict:
+    """Normalize one roster entry; problems go in its "errors" list instead of raising."""
+    teacher = {"username": "", "password": "", "classes": [], "subjects": [], "errors": []}
+    if not isinstance(entry, dict):
+        teacher["errors"].append("entry must be an object with username and password")
+        return teacher
+
+    username = entry.get("username")
+    if isinstance(username, (str, int)) and not isinstance(username, bool):
+        teacher["username"] = str(username).strip()
+    elif username is not None:
+        teacher["errors"].append("username: must be a string")
+
+    password = entry.get("password")
+    if isinstance(password, str):
+        teacher["password"] = password
+    elif password is not None:
+        teacher["errors"].append("password: must be a string")
+
+    for field in ("classes", "subjects"):
+        try:
+            teacher[field] = _split_names(entry.get(field))
+        except ValueError as exc:
+            teacher["errors"].append(f"{field}: {exc}")
+    return teacher
+
+def parse_roster(text: str, is_csv: bool) -> dict:
+    """Parse a roster file into {"classes": [...], "subjects": [...], "teachers": [...]}.
+
+    CSV rosters have one teacher per row with columns username, password,
+    classes and subjects, where classes and subjects are ';'-separated names.
+    JSON rosters are either a list of teacher objects or an object with
+    optional classes, subjects and teachers lists.
+    """
+    if is_csv:
+        teachers = list(csv.DictReader(io.StringIO(text)))
+        roster = {"classes": [], "subjects": [], "teachers": teachers}
+    else:
+        data = json.loads(text)
+        if isinstance(data, list):
+            data = {"teachers": data}
+        if not isinstance(data, dict):
+            raise ValueError("Roster must be a JSON object or array")
+        roster = {
+            "classes": data.get("classes") or [],
+            "subjects": data.get("subjects") or [],
+            "teachers": data.get("teachers") or []
+        }
+        if not isinstance(roster["teachers"], list):
+            raise ValueError("Roster teachers must be a JSON array")
+
+    roster["classes"] = _split_names(roster["classes"])
+    roster["subjects"] = _split_names(roster["subjects"])
+    # Malformed entries are reported per row by provision_roster
+    roster["teachers"] = [_parse_teacher(t) for t in roster["teachers"]]
+    return roster
+
+def _ensure_named(db: Session, model, names: Iterable[str]) -> Tuple[Dict[str, int], int]:
+    """Map names to ids for a Class/Subject model, creating missing rows in one batch."""
+    names = set(names)
+    lookup = {}
+    if names:
+        for row_id, name in db.query(model.id, model.name).filter(model.name.in_(names)).order_by(model.id):
+            lookup.setdefault(name, row_id)
+
+    missing = sorted(names - lookup.keys())
+    if missing:
+        db.execute(insert(model), [{"name": name} for name in missing])
+        for row_id, name in db.query(model.id, model.name).filter(model.name.in_(missing)).order_by(model.id):
+            lookup.setdefault(name, row_id)
+    return lookup, len(missing)
+
+def hash_passwords(passwords: List[str], workers: Optional[int] = None) -> List[str]:
+    """Hash passwords in parallel across CPU cores."""
+    if len(passwords) < 2:
+        return [utils.get_password_hash(p) for p in passwords]
+
+    workers = min(workers or os.cpu_count() or 1, len(passwords))
+    # spawn avoids forking a process that may already be running threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        return list(executor.map(
+            utils.get_password_hash,
+            passwords,
+            chunksize=max(1, len(passwords) // (workers * 4))
+        ))
+
+def provision_roster(db: Session, roster: dict, batch_size: int = 500, workers: Optional[int] = None) -> dict:
+    """Create the classes, subjects and teachers of a roster. Safe to re-run."""
+    # Existing classes and subjects are matched by name, existing teachers
+    # keep their password, and only missing assignments are added
+    errors = []
+    teachers = []
+    seen = set()
+    for row_number, teacher in enumerate(roster["teachers"], start=1):
+        if teacher.get("errors"):
+            errors.append({"row": row_number, "errors": teacher["errors"]})
+        elif not teacher["username"] or not teacher["password"]:
+            errors.append({"row": row_number, "errors": ["username and password are required"]})
+        elif teacher["username"] in seen:
+            errors.append({"row": row_number, "errors": [f"duplicate username {teacher['username']}"]})
+        else:
+            seen.add(teacher["username"])
+            teachers.append(teacher)
+
+    # Resolve every class and subject name to an id with one lookup map each
+    class_ids, classes_created = _ensure_named(
+        db, models.Class, set(roster["classes"]).union(*(t["classes"] for t in teachers))
+    )
+    subject_ids, subjects_created = _ensure_named(
+        db, models.Subject, set(roster["subjects"]).union(*(t["subjects"] for t in teachers))
+    )
+    db.commit()
+
+    existing = dict(db.query(models.Teacher.username, models.Teacher.id).filter(
+        models.Teacher.username.in_(seen)
+    ).all()) if seen else {}
+
+    # Only new teachers pay for bcrypt
+    new_teachers = [t for t in teachers if t["username"] not in existing]
+    hashes = dict(zip(
+        (t["username"] for t in new_teachers),
+        hash_passwords([t["password"] for t in new_teachers], workers)
+    ))
+
+    teachers_created = 0
+    assignments_added = 0
+    for start in range(0, len(teachers), batch_size):
+        batch = teachers[start:start + batch_size]
+        batch_new = [t for t in batch if t["username"] not in existing]
+        if batch_new:
+            db.execute(insert(models.Teacher), [
+                {"username": t["username"], "password_hash": hashes[t["username"]]}
+                for t in batch_new
+            ])
+            existing.update(db.query(models.Teacher.username, models.Teacher.id).filter(
+                models.Teacher.username.in_([t["username"] for t in batch_new])
+            ).all())
+            teachers_created += len(batch_new)
+
+        # Assignments follow create_teacher: one row per class and one per subject
+        batch_ids = [existing[t["username"]] for t in batch]
+        current = set(db.query(
+            models.teacher_class_subject.c.teacher_id,
+            models.teacher_class_subject.c.class_id,
+            models.teacher_class_subject.c.subject_id
+        ).filter(models.teacher_class_subject.c.teacher_id.in_(batch_ids)).all())
+
+        wanted = []
+        for teacher in batch:
+            teacher_id = existing[teacher["username"]]
+            pairs = [(teacher_id, class_ids[name], None) for name in dict.fromkeys(teacher["classes"])]
+            pairs += [(teacher_id, None, subject_ids[name]) for name in dict.fromkeys(teacher["subjects"])]
+            wanted.extend(p for p in pairs if p not in current)
+
+        if wanted:
+            db.execute(insert(models.teacher_class_subject), [
+                {"teacher_id": t, "class_id": c, "subject_id": s} for t, c, s in wanted
+            ])
+            assignments_added += len(wanted)
+        db.commit()
+
+        for teacher in batch:
+            teacher_access_cache.invalidate(teacher["username"])
+
+    return {
+        "classes_created": classes_created,
+        "subjects_created": subjects_created,
+        "teachers_created": teachers_created,
+        "teachers_existing": len(teachers) - teachers_created,
+        "assignments_added": assignments_added,
+        "errors": errors
+    }
+
+if __name__ == "__main__":
+    # Provision from a roster file: python -m app.bulk roster.csv
+    import argparse
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Provision teachers, classes and subjects from a roster file")
+    parser.add_argument("roster", help="CSV or JSON roster file")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None, help="Processes used for password hashing")
+    args = parser.parse_args()
+
+    with open(args.roster, encoding="utf-8-sig") as f:
+        roster = parse_roster(f.read(), is_csv=args.roster.lower().endswith(".csv"))
+
+    db = SessionLocal()
+    try:
+        summary = provision_roster(db, roster, args.batch_size, args.workers)
+    finally:
+        db.close()
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,281 @@
+import asyncio
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from . import models
+from .config import settings
+
+# All registered caches, for the stats endpoint
+_caches: List[Any] = []
+
+# Result handed to coalesced waiters when the shared load failed; they retry
+_RETRY = object()
+
+def invalidate_test(db: Session, test_id: int) -> None:
+    """Bump the version stamp of a test, invalidating every per-test cache.
+
+    The stamp is the tests.version column, so every worker sees the bump.
+    Call it in the same transaction as the change it covers, before commit;
+    anything that changes what a student sees or how a test is scored must.
+    """
+    db.execute(
+        update(models.Test).where(models.Test.id == test_id).values(
+            version=models.Test.version + 1
+        )
+    )
+
+class VersionedCache:
+    """Per-test cache whose entries are stamped with the test version they were built from.
+
+    Callers pass the version of the test row they loaded. Empty values (a
+    test without questions yet) are returned but never cached. At most
+    max_entries tests are kept; the least recently used is evicted first.
+    """
+
+    def __init__(self, name: str, max_entries: int):
+        self.name = name
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[int, Tuple[int, Any]]" = OrderedDict()
+        self._inflight: Dict[Tuple[int, int], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def _lookup(self, test_id: int, version: int, is_fresh: Optional[Callable[[Any], bool]] = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(test_id)
+            if entry is not None:
+                self._entries.move_to_end(test_id)
+        if entry is not None and entry[0] == version and (is_fresh is None or is_fresh(entry[1])):
+            self.hits += 1
+            return entry[1]
+        return None
+
+    def _store(self, test_id: int, version: int, value: Any) -> None:
+        if not value:
+            return
+        with self._lock:
+            entry = self._entries.get(test_id)
+            # A slow load of an older version must not replace a newer one
+            if entry is None or entry[0] <= version:
+                self._entries[test_id] = (version, value)
+                self._entries.move_to_end(test_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+    def get_or_load(
+        self,
+        test_id: int,
+        version: int,
+        loader: Callable[[], Any],
+        is_fresh: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """Return the cached value for a test, calling loader on a miss or a stale version.
+
+        is_fresh can reject a cached value for reasons the version stamp does
+        not cover, such as new attempts.
+        """
+        value = self._lookup(test_id, version, is_fresh)
+        if value is not None:
+            return value
+
+        self.misses += 1
+        value = loader()
+        self._store(test_id, version, value)
+        return value
+
+    async def get_or_load_async(self, test_id: int, version: int, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Async variant of get_or_load for loaders that await the database.
+
+        Concurrent misses for the same test version share a single load, so
+        a burst of submissions right after a change reads the questions once.
+        """
+        key = (test_id, version)
+        while True:
+            value = self._lookup(test_id, version)
+            if value is not None:
+                return value
+
+            shared = self._inflight.get(key)
+            if shared is None:
+                break
+            value = await asyncio.shield(shared)
+            if value is not _RETRY:
+                self.hits += 1
+                return value
+
+        self.misses += 1
+        shared = self._inflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await loader()
+        except BaseException:
+            shared.set_result(_RETRY)
+            raise
+        else:
+            self._store(test_id, version, value)
+            shared.set_result(value)
+        finally:
+            del self._inflight[key]
+        return value
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Get hit/miss counters for this cache."""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+class TokenCache:
+    """Bounded LRU cache of verified token claims keyed by a hash of the token."""
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: int):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Any]:
+        """Return cached claims for a token, or None if absent or expired."""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def put(self, token: str, value: Any, expires_at: float) -> None:
+        """Cache claims until the earlier of the token's exp and the TTL."""
+        deadline = min(expires_at, time.time() + self.ttl_seconds)
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (deadline, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the cache entries."""
+        with self._lock:
+            entries = list(self._entries.items())
+        total = sys.getsizeof(self._entries)
+        for key, entry in entries:
+            total += sys.getsizeof(key) + sys.getsizeof(entry) + sys.getsizeof(entry[1])
+            for slot in getattr(entry[1], "__slots__", ()):
+                total += sys.getsizeof(getattr(entry[1], slot, None))
+        return total
+
+    def stats(self) -> dict:
+        """Get hit rate and memory footprint for this cache."""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_bytes": self.memory_bytes()
+        }
+
+class KeyedCache:
+    """Unbounded cache of small values keyed by name.
+
+    Explicit invalidation only reaches the worker that made the change, so
+    entries also expire after ttl_seconds; other workers catch up by then.
+    Missing values (None) are not cached.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[Any, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def get_or_load(self, key: Any, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for key, calling loader on a miss or once it expired."""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        value = loader()
+        if value is not None:
+            with self._lock:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        return value
+
+    def invalidate(self, key: Any) -> None:
+        """Drop the entry for key so the next lookup reloads it."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        """Get hit/miss counters for this cache."""
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+def cache_stats() -> List[dict]:
+    """Get stats for every registered cache."""
+    return [c.stats() for c in _caches]
+
+# Answer keys used by submit_test: {str(question_id): correct_option}
+answer_key_cache = VersionedCache("answer_key", settings.TEST_CACHE_SIZE)
+
+# Teacher authorization sets used by teacher_routes: {username: TeacherAccess}
+teacher_access_cache = KeyedCache("teacher_access", settings.TEACHER_ACCESS_TTL_SECONDS)
+
+# Sanitized exam papers served by start_test: shuffle.Paper
+paper_cache = VersionedCache("paper", settings.TEST_CACHE_SIZE)
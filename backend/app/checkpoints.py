@@ -0,0 +1,204 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import delete, exists, tuple_
+from sqlalchemy.orm import Session
+from . import models
+from .answers import pack_answers, question_ids, unpack_answers
+from .config import settings
+from .database import AsyncSessionLocal, async_write_guard
+
+logger = logging.getLogger(__name__)
+
+# (test_id, roll_no, section)
+CheckpointKey = Tuple[int, str, str]
+
+# Keys per row lookup query, keeping bound parameters well under SQLite's limit
+LOOKUP_BATCH_SIZE = 500
+
+def apply_changes(answers: Dict[str, int], changes: Dict[str, Optional[int]]) -> Dict[str, int]:
+    """Apply changed answers on top of saved ones; None clears an answer."""
+    merged = dict(answers)
+    for question_id, option in changes.items():
+        if option is None:
+            merged.pop(question_id, None)
+        else:
+            merged[question_id] = option
+    return merged
+
+def submitted_keys(db: Session, keys) -> Set[CheckpointKey]:
+    """The keys whose student already has an attempt."""
+    roll_nos_by_test: Dict[int, Set[str]] = {}
+    for test_id, roll_no, _ in keys:
+        roll_nos_by_test.setdefault(test_id, set()).add(roll_no)
+
+    submitted = set()
+    for test_id, roll_nos in roll_nos_by_test.items():
+        rows = db.query(models.StudentAttempt.roll_no, models.StudentAttempt.section).filter(
+            models.StudentAttempt.test_id == test_id,
+            models.StudentAttempt.roll_no.in_(roll_nos)
+        ).all()
+        submitted.update((test_id, roll_no, section) for roll_no, section in rows)
+    return submitted.intersection(keys)
+
+def load_checkpoints(db: Session, keys: List[CheckpointKey]) -> Dict[CheckpointKey, models.AnswerCheckpoint]:
+    """Load the stored checkpoint rows for many keys with one query per LOOKUP_BATCH_SIZE keys."""
+    checkpoint_table = models.AnswerCheckpoint
+    columns = tuple_(checkpoint_table.test_id, checkpoint_table.roll_no, checkpoint_table.section)
+    rows = {}
+    for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+        for checkpoint in db.query(checkpoint_table).filter(
+            columns.in_(keys[start:start + LOOKUP_BATCH_SIZE])
+        ):
+            rows[(checkpoint.test_id, checkpoint.roll_no, checkpoint.section)] = checkpoint
+    return rows
+
+def write_checkpoints(db: Session, batch: Dict[CheckpointKey, dict]) -> int:
+    """Merge buffered changes into the checkpoint rows and return how many were written.
+
+    The caller commits. Students who submitted since saving are skipped,
+    and checkpoint rows that outlived a submission are deleted, so no
+    checkpoint reappears.
+    """
+    test_ids = {key[0] for key in batch}
+    attempt = models.StudentAttempt
+    checkpoint_table = models.AnswerCheckpoint
+    db.execute(
+        delete(checkpoint_table).where(
+            checkpoint_table.test_id.in_(test_ids),
+            exists().where(
+                attempt.test_id == checkpoint_table.test_id,
+                attempt.roll_no == checkpoint_table.roll_no,
+                attempt.section == checkpoint_table.section
+            )
+        ).execution_options(synchronize_session=False)
+    )
+    submitted = submitted_keys(db, batch)
+    keys = [key for key in batch if key not in submitted]
+    stored = load_checkpoints(db, keys)
+
+    ids_by_test: Dict[int, List[int]] = {}
+    now = datetime.utcnow()
+    for key in keys:
+        pending = batch[key]
+        test_id = key[0]
+        if test_id not in ids_by_test:
+            ids_by_test[test_id] = question_ids(db, test_id)
+        ids = ids_by_test[test_id]
+
+        checkpoint = stored.get(key)
+        if checkpoint is None:
+            checkpoint = models.AnswerCheckpoint(test_id=test_id, roll_no=key[1], section=key[2])
+            db.add(checkpoint)
+            saved = {}
+        else:
+            saved = unpack_answers(checkpoint.answer_vector or b"", ids)
+
+        checkpoint.student_name = pending["student_name"]
+        checkpoint.answer_vector = pack_answers(apply_changes(saved, pending["changes"]), ids)
+        checkpoint.updated_at = now
+    return len(keys)
+
+class CheckpointBuffer:
+    """Coalesces autosaves in memory and writes them in one transaction every few seconds.
+
+    Each save only merges into a dict, so a student clicking through an exam
+    costs one row write per flush interval rather than one commit per click.
+    Changes are kept as deltas and merged into the stored row at flush time,
+    so saves landing on different workers still combine.
+    """
+
+    def __init__(self, flush_seconds: float, max_pending: int):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.saves = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self._pending: Dict[CheckpointKey, dict] = {}
+        self._flush_now = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, key: CheckpointKey, student_name: str, changes: Dict[str, Optional[int]]) -> None:
+        """Buffer changed answers for a student."""
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = {"student_name": student_name, "changes": {}}
+        pending["student_name"] = student_name
+        pending["changes"].update(changes)
+        self.saves += 1
+        if len(self._pending) >= self.max_pending:
+            self._flush_now.set()
+
+    def pending_changes(self, key: CheckpointKey) -> Dict[str, Optional[int]]:
+        """Changes for a student that have not been written yet."""
+        pending = self._pending.get(key)
+        return dict(pending["changes"]) if pending else {}
+
+    def discard(self, key: CheckpointKey) -> None:
+        """Drop unwritten changes, e.g. once the student has submitted."""
+        self._pending.pop(key, None)
+
+    async def flush(self) -> int:
+        """Write all buffered changes in one transaction; return the number of rows written."""
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        try:
+            async with AsyncSessionLocal() as db:
+                async with async_write_guard():
+                    written = await db.run_sync(write_checkpoints, batch)
+                    await db.commit()
+        except Exception:
+            # Put the batch back underneath anything saved in the meantime
+            for key, pending in batch.items():
+                newer = self._pending.get(key)
+                if newer is not None:
+                    pending["student_name"] = newer["student_name"]
+                    pending["changes"].update(newer["changes"])
+                self._pending[key] = pending
+            raise
+
+        self.flushes += 1
+        self.rows_written += written
+        return written
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Writing answer checkpoints failed; retrying next interval")
+
+    def start(self) -> None:
+        """Start the periodic flush on the running event loop."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        """Get buffer counters."""
+        return {
+            "pending": len(self._pending),
+            "saves": self.saves,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "flush_seconds": self.flush_seconds
+        }
+
+checkpoint_buffer = CheckpointBuffer(settings.CHECKPOINT_FLUSH_SECONDS, settings.CHECKPOINT_MAX_PENDING)
@@ -8,9 +8,70 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Verified token cache used by get_current_user
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+    
+    # How long a worker trusts its cached teacher class/subject assignments;
+    # changes made through another worker take effect within this time
+    TEACHER_ACCESS_TTL_SECONDS: int = 30
+    
+    # Tests kept in each per-test cache (answer keys, papers, item analysis)
+    TEST_CACHE_SIZE: int = 256
+    
+    # Password hashing: bcrypt cost factor and the worker pool that runs it
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    
     # Database Settings
     DATABASE_URL: str = "sqlite:///./mcq_test.db"
     
+    # Connection pool (ignored for SQLite, which does not pool file connections)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    
+    # Async driver URL for the student endpoints; derived from DATABASE_URL when unset
+    ASYNC_DATABASE_URL: Optional[str] = None
+    
+    # SQLite tuning: WAL journaling, synchronous=NORMAL, mmap and busy timeout
+    SQLITE_OPTIMIZED: bool = True
+    SQLITE_MMAP_SIZE: int = 268435456  # 256 MB
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    
+    # Number of top performers kept per class in the performance aggregates
+    PERFORMANCE_TOP_K: int = 10
+    
+    # Exam autosave: checkpoints are buffered in memory and written in one
+    # batch every CHECKPOINT_FLUSH_SECONDS, or sooner once this many students are pending
+    CHECKPOINT_FLUSH_SECONDS: float = 5.0
+    CHECKPOINT_MAX_PENDING: int = 5000
+    
+    # Live exam monitoring: snapshot fan-out interval and SSE keepalive. Use
+    # LIVE_BACKEND="redis" with LIVE_BROKER_URL to share events across workers
+    LIVE_BACKEND: str = "memory"
+    LIVE_BROKER_URL: Optional[str] = None
+    LIVE_TICK_SECONDS: float = 1.0
+    LIVE_KEEPALIVE_SECONDS: float = 15.0
+    
+    # Per-student question and option order, derived from the student and a
+    # secret (SECRET_KEY when unset). Do not change either while an exam is running.
+    SHUFFLE_PAPERS: bool = True
+    SHUFFLE_SECRET: Optional[str] = None
+    
+    # Uploaded media: content-addressed store, the base URL recorded on
+    # questions, and an optional nginx internal location to hand serving off to
+    MEDIA_ROOT: str = "./media"
+    MEDIA_BASE_URL: str = "http://localhost:8000"
+    MEDIA_MAX_UPLOAD_BYTES: int = 209715200  # 200 MB
+    MEDIA_ACCEL_REDIRECT: Optional[str] = None
+    
+    # Opt-in SQL profiling: per-request query headers, log lines and N+1 warnings
+    SQL_PROFILING: bool = False
+    SQL_N_PLUS_ONE_THRESHOLD: int = 5
+    
     # Admin Default Credentials (for first-time setup)
     ADMIN_USERNAME: str = "admin"
     ADMIN_PASSWORD: str = "admin123"  # Change in production
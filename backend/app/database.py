@@ -1,18 +1,108 @@
-from sqlalchemy import create_engine
+import asyncio
+import contextlib
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
 
-# Create SQLite database URL
-SQLALCHEMY_DATABASE_URL = "sqlite:///./mcq_test.db"
+# Database URL from settings (SQLite by default, PostgreSQL in production)
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-# Create database engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection for concurrent readers and writers."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """Create a database engine configured from settings."""
+    if url.startswith("sqlite"):
+        engine = create_engine(
+            url,
+            connect_args={
+                "check_same_thread": False,
+                "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+            }
+        )
+        if settings.SQLITE_OPTIMIZED:
+            event.listen(engine, "connect", _apply_sqlite_pragmas)
+        return engine
+    
+    return create_engine(
+        url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS
+    )
+
+def get_async_database_url(url: str = SQLALCHEMY_DATABASE_URL) -> str:
+    """Map a sync database URL to its asyncio driver (aiosqlite or asyncpg)."""
+    if settings.ASYNC_DATABASE_URL:
+        return settings.ASYNC_DATABASE_URL
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+def create_async_db_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """Create an asyncio database engine configured from settings."""
+    async_url = get_async_database_url(url)
+    if async_url.startswith("sqlite"):
+        engine = create_async_engine(
+            async_url,
+            connect_args={"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}
+        )
+        if settings.SQLITE_OPTIMIZED:
+            event.listen(engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        return engine
+    
+    return create_async_engine(
+        async_url,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS
+    )
 
-# Create SessionLocal class
+# Create database engines
+engine = create_db_engine()
+async_engine = create_async_db_engine()
+
+# Create SessionLocal classes
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
+# SQLite allows one writer at a time. Queue async write transactions in-process
+# instead of letting hundreds of them spin on the busy timeout.
+_sqlite_write_lock = asyncio.Lock()
+
+def async_write_guard():
+    """Context manager that serializes async write transactions on SQLite."""
+    if async_engine.dialect.name == "sqlite":
+        return _sqlite_write_lock
+    return contextlib.AsyncExitStack()
+
+# Dialects with INSERT ... ON CONFLICT DO NOTHING
+_CONFLICT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+def insert_ignoring_conflicts(model, conflict_columns):
+    """INSERT that skips (rowcount 0) a row violating the unique index on conflict_columns.
+
+    Other databases get a plain INSERT, which raises IntegrityError instead.
+    """
+    conflict_insert = _CONFLICT_INSERTS.get(async_engine.dialect.name)
+    if conflict_insert is None:
+        return insert(model)
+    return conflict_insert(model).on_conflict_do_nothing(index_elements=conflict_columns)
 
 # Create Base class
 Base = declarative_base()
@@ -24,3 +114,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,98 @@
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator
+from fastapi.responses import StreamingResponse
+from . import models
+from .answers import question_ids, unpack_answers
+from .database import SessionLocal
+
+EXPORT_COLUMNS = ["id", "test_id", "roll_no", "student_name", "section", "score", "completed_at", "answers"]
+
+# Columns read as-is; answers are unpacked from the answer vector
+ROW_COLUMNS = EXPORT_COLUMNS[:-1]
+
+# Flush the output buffer once it holds roughly this many characters
+CHUNK_SIZE = 64 * 1024
+
+def iter_attempt_rows(test_id: int, batch_size: int = 1000) -> Iterator[dict]:
+    """Stream a test's attempts through a server-side cursor, one dict per row."""
+    # The generator owns its session because it outlives the request handler
+    db = SessionLocal()
+    try:
+        ids = question_ids(db, test_id)
+        query = db.query(
+            *[getattr(models.StudentAttempt, column) for column in ROW_COLUMNS],
+            models.StudentAttempt.answer_vector,
+            models.StudentAttempt.answers
+        ).filter(
+            models.StudentAttempt.test_id == test_id
+        ).order_by(
+            models.StudentAttempt.id
+        ).execution_options(stream_results=True).yield_per(batch_size)
+
+        for *row, vector, legacy in query:
+            record = dict(zip(ROW_COLUMNS, row))
+            record["answers"] = unpack_answers(vector, ids) if vector is not None else legacy
+            if record["completed_at"] is not None:
+                record["completed_at"] = record["completed_at"].isoformat()
+            yield record
+    finally:
+        db.close()
+
+def csv_chunks(rows: Iterable[dict]) -> Iterator[bytes]:
+    """Encode rows as CSV, yielding the output in chunks."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for record in rows:
+        record["answers"] = json.dumps(record["answers"])
+        writer.writerow([record[column] for column in EXPORT_COLUMNS])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+def ndjson_chunks(rows: Iterable[dict]) -> Iterator[bytes]:
+    """Encode rows as newline-delimited JSON, yielding the output in chunks."""
+    lines = []
+    size = 0
+    for record in rows:
+        line = json.dumps(record)
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_SIZE:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+            size = 0
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Gzip a stream of chunks without buffering the whole body."""
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def export_attempts_response(test_id: int, fmt: str, compress: bool) -> StreamingResponse:
+    """Build a streaming download of a test's attempts as CSV or NDJSON."""
+    rows = iter_attempt_rows(test_id)
+    if fmt == "csv":
+        chunks, media_type, extension = csv_chunks(rows), "text/csv", "csv"
+    else:
+        chunks, media_type, extension = ndjson_chunks(rows), "application/x-ndjson", "ndjson"
+
+    filename = f"test_{test_id}_attempts.{extension}"
+    if compress:
+        chunks, media_type, filename = gzip_chunks(chunks), "application/gzip", filename + ".gz"
+
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,261 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, Optional, Set, Tuple
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from . import models
+from .config import settings
+from .database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Redis channel shared by all workers when LIVE_BACKEND is "redis"
+REDIS_CHANNEL = "mcq:live-events"
+
+class MemoryBackend:
+    """Delivers events within this process only; enough for a single worker."""
+
+    def __init__(self):
+        self._deliver: Optional[Callable[[dict], None]] = None
+
+    def publish(self, event: dict) -> None:
+        if self._deliver is not None:
+            self._deliver(event)
+
+    async def start(self, deliver: Callable[[dict], None]) -> None:
+        self._deliver = deliver
+
+    async def stop(self) -> None:
+        self._deliver = None
+
+class RedisBackend:
+    """Relays events through a Redis channel so every worker sees every event (pip install redis)."""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError as exc:
+            raise RuntimeError("LIVE_BACKEND=redis requires the redis package") from exc
+        self._redis = redis.from_url(url)
+        self._outbox: Optional[asyncio.Queue] = None
+        self._tasks = []
+
+    def publish(self, event: dict) -> None:
+        # Never make a request wait on the broker
+        if self._outbox is not None:
+            self._outbox.put_nowait(json.dumps(event))
+
+    async def _send(self) -> None:
+        while True:
+            message = await self._outbox.get()
+            try:
+                await self._redis.publish(REDIS_CHANNEL, message)
+            except Exception:
+                logger.exception("Publishing a live event failed")
+
+    async def _receive(self, deliver: Callable[[dict], None]) -> None:
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(REDIS_CHANNEL)
+        async for message in pubsub.listen():
+            if message["type"] == "message":
+                deliver(json.loads(message["data"]))
+
+    async def start(self, deliver: Callable[[dict], None]) -> None:
+        self._outbox = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._send()), loop.create_task(self._receive(deliver))]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._outbox = None
+        await self._redis.close()
+
+def create_backend():
+    """Build the event backend selected by LIVE_BACKEND."""
+    if settings.LIVE_BACKEND == "redis":
+        return RedisBackend(settings.LIVE_BROKER_URL or "redis://localhost:6379/0")
+    return MemoryBackend()
+
+class TestProgress:
+    """Live counters of one test, keyed by student so replayed events are harmless."""
+    __slots__ = ("started", "scores", "score_sum")
+
+    def __init__(self):
+        self.started: Set[Tuple[str, str]] = set()
+        self.scores: Dict[Tuple[str, str], int] = {}
+        self.score_sum = 0
+
+    def apply(self, event: dict) -> bool:
+        """Fold an event in; return whether anything changed."""
+        student = (event["roll_no"], event["section"])
+        if event["type"] == "submitted":
+            if student in self.scores:
+                return False
+            self.scores[student] = event["score"]
+            self.score_sum += event["score"]
+            return True
+        if student in self.started:
+            return False
+        self.started.add(student)
+        return True
+
+    def snapshot(self, test_id: int) -> dict:
+        started = len(self.started | self.scores.keys())
+        submitted = len(self.scores)
+        return {
+            "test_id": test_id,
+            "started": started,
+            "submitted": submitted,
+            "in_progress": started - submitted,
+            "average_score": round(self.score_sum / submitted, 2) if submitted else None,
+            "updated_at": datetime.utcnow().isoformat()
+        }
+
+async def load_progress(test_id: int) -> list:
+    """Events reconstructing a test's progress so far from the database."""
+    async with AsyncSessionLocal() as db:
+        attempts = (await db.execute(
+            select(
+                models.StudentAttempt.roll_no,
+                models.StudentAttempt.section,
+                models.StudentAttempt.score
+            ).where(models.StudentAttempt.test_id == test_id)
+        )).all()
+        # Students with an autosave have started even if nothing was streamed yet
+        checkpoints = (await db.execute(
+            select(models.AnswerCheckpoint.roll_no, models.AnswerCheckpoint.section).where(
+                models.AnswerCheckpoint.test_id == test_id
+            )
+        )).all()
+    events = [
+        {"type": "submitted", "roll_no": roll_no, "section": section, "score": score}
+        for roll_no, section, score in attempts
+    ]
+    events += [
+        {"type": "started", "roll_no": roll_no, "section": section}
+        for roll_no, section in checkpoints
+    ]
+    return events
+
+def _offer(queue: asyncio.Queue, update: dict) -> None:
+    """Replace whatever a subscriber has not read yet with the latest update."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(update)
+
+class LiveMonitor:
+    """In-process pub/sub of exam progress.
+
+    Events only update counters; once per tick each changed test produces a
+    single snapshot that is handed to all of its subscribers. A subscriber
+    holds at most one unread update, so slow clients skip ahead instead of
+    queueing. Progress is only tracked for tests someone is watching.
+    """
+
+    def __init__(self, backend, tick_seconds: float):
+        self.backend = backend
+        self.tick_seconds = tick_seconds
+        self._progress: Dict[int, TestProgress] = {}
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._dirty: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def publish_started(self, test_id: int, roll_no: str, section: str) -> None:
+        self.backend.publish({"type": "started", "test_id": test_id, "roll_no": roll_no, "section": section})
+
+    def publish_submitted(self, test_id: int, roll_no: str, section: str, score: int) -> None:
+        self.backend.publish({
+            "type": "submitted",
+            "test_id": test_id,
+            "roll_no": roll_no,
+            "section": section,
+            "score": score
+        })
+
+    def _deliver(self, event: dict) -> None:
+        progress = self._progress.get(event["test_id"])
+        if progress is not None and progress.apply(event):
+            self._dirty.add(event["test_id"])
+
+    async def subscribe(self, test_id: int) -> asyncio.Queue:
+        """Register a subscriber; its queue starts with the current snapshot."""
+        progress = self._progress.get(test_id)
+        if progress is None:
+            # Track events from now on, then fold in the history; both are
+            # keyed by student so overlap between them is counted once
+            progress = self._progress[test_id] = TestProgress()
+            for event in await load_progress(test_id):
+                progress.apply(event)
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._subscribers.setdefault(test_id, set()).add(queue)
+        _offer(queue, progress.snapshot(test_id))
+        return queue
+
+    def unsubscribe(self, test_id: int, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(test_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[test_id]
+            self._progress.pop(test_id, None)
+            self._dirty.discard(test_id)
+
+    def tick(self) -> None:
+        """Fan out one snapshot per changed test."""
+        dirty, self._dirty = self._dirty, set()
+        for test_id in dirty:
+            progress = self._progress.get(test_id)
+            if progress is None:
+                continue
+            update = progress.snapshot(test_id)
+            for queue in self._subscribers.get(test_id, ()):
+                _offer(queue, update)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            self.tick()
+
+    async def start(self) -> None:
+        await self.backend.start(self._deliver)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.backend.stop()
+
+    async def stream(self, request: Request, test_id: int) -> AsyncIterator[str]:
+        """Server-sent events for one subscriber, with keepalive comments while idle."""
+        queue = await self.subscribe(test_id)
+        try:
+            while True:
+                try:
+                    update = await asyncio.wait_for(queue.get(), settings.LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: progress\ndata: {json.dumps(update)}\n\n"
+        finally:
+            self.unsubscribe(test_id, queue)
+
+def live_response(request: Request, test_id: int) -> StreamingResponse:
+    """Build the server-sent event stream of a test's progress."""
+    return StreamingResponse(
+        live_monitor.stream(request, test_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+live_monitor = LiveMonitor(create_backend(), settings.LIVE_TICK_SECONDS)
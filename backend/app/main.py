@@ -1,45 +1,38 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import logging
+import os
+import time
+
+# Taken before the imports below so they count toward cold-start time
+_import_started = time.perf_counter()
+
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
-from . import models, schemas, utils
-from .database import engine, get_db
-from .routes import admin_routes, teacher_routes, student_routes
-from .config import settings
-import uvicorn
-
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="MCQ Test Application")
-
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, replace with specific origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include routers
-app.include_router(admin_routes.router)
-app.include_router(teacher_routes.router)
-app.include_router(student_routes.router)
+from . import media, metrics, models, schemas, utils
+from .checkpoints import checkpoint_buffer
+from .database import async_engine, engine, get_db
+from .live import live_monitor
+from .routes import admin_routes, teacher_routes, student_routes, media_routes
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
 
 # Root endpoint
-@app.get("/")
+@router.get("/")
 async def root():
     return {"message": "Welcome to MCQ Test Application API"}
 
 # Admin login endpoint
-@app.post("/admin/login", response_model=schemas.Token)
+@router.post("/admin/login", response_model=schemas.Token)
 async def admin_login(username: str, password: str, db: Session = Depends(get_db)):
     """Login endpoint for admin."""
     admin = db.query(models.Admin).filter(
         models.Admin.username == username
     ).first()
     
-    if not admin or not utils.verify_password(password, admin.password_hash):
+    if not admin or not await utils.verify_password_async(password, admin.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -54,28 +47,83 @@ async def admin_login(username: str, password: str, db: Session = Depends(get_db
     return {"access_token": access_token, "token_type": "bearer"}
 
 # Health check endpoint
-@app.get("/health")
+@router.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
-# Create initial admin user if not exists
-@app.on_event("startup")
-async def create_initial_admin():
-    db = next(get_db())
-    admin = db.query(models.Admin).filter(
-        models.Admin.username == settings.ADMIN_USERNAME
-    ).first()
-    
-    if not admin:
-        hashed_password = utils.get_password_hash(settings.ADMIN_PASSWORD)
-        admin = models.Admin(
-            username=settings.ADMIN_USERNAME,
-            password_hash=hashed_password
+# Prometheus metrics endpoint (per worker)
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+def create_app() -> FastAPI:
+    """Build the application.
+
+    Does no database work, so workers start fast and never race each other;
+    create the schema and initial admin once with `python -m app.manage setup`.
+    """
+    app = FastAPI(title="MCQ Test Application")
+
+    # Configure CORS
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # In production, replace with specific origins
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Record per-route request metrics, including database queries
+    metrics.instrument_engine(engine)
+    metrics.instrument_engine(async_engine.sync_engine)
+    app.add_middleware(metrics.MetricsMiddleware, router_app=app)
+
+    # Refuse oversized media uploads before they are spooled to disk
+    app.add_middleware(media.UploadLimitMiddleware)
+
+    # Include routers
+    app.include_router(router)
+    app.include_router(admin_routes.router)
+    app.include_router(teacher_routes.router)
+    app.include_router(student_routes.router)
+    app.include_router(media_routes.router)
+
+    @app.on_event("startup")
+    async def start_background_tasks():
+        started = time.perf_counter()
+        # Write buffered answer checkpoints periodically
+        checkpoint_buffer.start()
+        # Fan out live exam progress to monitoring streams
+        await live_monitor.start()
+        record_startup("startup", time.perf_counter() - started)
+
+    @app.on_event("shutdown")
+    async def stop_background_tasks():
+        await checkpoint_buffer.stop()
+        await live_monitor.stop()
+
+    return app
+
+def record_startup(phase: str, seconds: float) -> None:
+    """Record a cold-start phase in /metrics and log the worker's total once it is ready."""
+    metrics.registry.startup_seconds[phase] = seconds
+    if phase == "startup":
+        timings = metrics.registry.startup_seconds
+        logger.info(
+            "Worker %d ready in %.1fms (import %.1fms, startup %.1fms)",
+            os.getpid(), sum(timings.values()) * 1000,
+            timings.get("import", 0.0) * 1000, seconds * 1000
         )
-        db.add(admin)
-        db.commit()
+
+app = create_app()
+record_startup("import", time.perf_counter() - _import_started)
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
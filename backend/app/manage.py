@@ -0,0 +1,55 @@
+"""Management commands, run once per deployment rather than in every worker.
+
+Run from the backend directory:
+
+    python -m app.manage setup               # migrate, then create the initial admin
+    python -m app.manage migrate             # create or upgrade the schema
+    python -m app.manage create-admin        # create ADMIN_USERNAME if it does not exist
+    python -m app.manage rebuild-aggregates  # recompute class performance from attempts
+"""
+import argparse
+from sqlalchemy.exc import IntegrityError
+from . import aggregates, migrations, models, utils
+from .config import settings
+from .database import SessionLocal
+
+def create_admin() -> bool:
+    """Create the initial admin from settings; return whether one was created."""
+    with SessionLocal() as db:
+        exists = db.query(models.Admin.id).filter(
+            models.Admin.username == settings.ADMIN_USERNAME
+        ).first()
+        if exists:
+            return False
+
+        db.add(models.Admin(
+            username=settings.ADMIN_USERNAME,
+            password_hash=utils.get_password_hash(settings.ADMIN_PASSWORD)
+        ))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another process created it first; the username index is unique
+            db.rollback()
+            return False
+        return True
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="MCQ Test Application management commands")
+    parser.add_argument("command", choices=["setup", "migrate", "create-admin", "rebuild-aggregates"])
+    args = parser.parse_args(argv)
+
+    if args.command in ("setup", "migrate"):
+        migrations.run()
+    if args.command in ("setup", "create-admin"):
+        if create_admin():
+            print(f"Created admin '{settings.ADMIN_USERNAME}'")
+        else:
+            print(f"Admin '{settings.ADMIN_USERNAME}' already exists")
+    if args.command == "rebuild-aggregates":
+        with SessionLocal() as db:
+            count = aggregates.rebuild_class_performance(db)
+        print(f"Rebuilt performance aggregates for {count} classes")
+
+if __name__ == "__main__":
+    main()
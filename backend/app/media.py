@@ -0,0 +1,217 @@
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+from typing import BinaryIO, NamedTuple, Optional, Tuple
+import anyio
+from fastapi import HTTPException, status
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .config import settings
+
+# Stored files are named by the SHA-256 of their content plus the extension
+MEDIA_NAME = re.compile(r"^[0-9a-f]{64}\.[a-z0-9]+$")
+
+CHUNK_SIZE = 64 * 1024
+
+# Upload endpoints whose request bodies UploadLimitMiddleware bounds
+UPLOAD_PATH = re.compile(r"^/teacher/questions/\d+/media$")
+
+# Allowance for the multipart boundaries and part headers around the file
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Content never changes under a given name, so caches may keep it forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+class MediaTooLarge(Exception):
+    """An upload exceeded MEDIA_MAX_UPLOAD_BYTES."""
+
+class RangeNotSatisfiable(Exception):
+    """A Range header selected no bytes of the file."""
+
+class StoredMedia(NamedTuple):
+    name: str
+    sha256: str
+    size: int
+    created: bool
+
+def media_path(name: str) -> str:
+    """Location of a stored file, fanned out by hash prefix to keep directories small."""
+    return os.path.join(settings.MEDIA_ROOT, name[:2], name[2:4], name)
+
+def media_etag(name: str) -> str:
+    """Strong ETag of a stored file; its name already is the content hash."""
+    return '"%s"' % name.split(".")[0]
+
+def store_media(source: BinaryIO, extension: str) -> StoredMedia:
+    """Copy an upload into the store, hashing it on the way; identical content is kept once.
+
+    The file is written under a temporary name and moved into place atomically,
+    so a concurrent upload of the same content never exposes a partial file.
+    Blocking; run it in a thread pool.
+    """
+    tmp_dir = os.path.join(settings.MEDIA_ROOT, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.MEDIA_MAX_UPLOAD_BYTES:
+                    raise MediaTooLarge()
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        sha256 = digest.hexdigest()
+        name = f"{sha256}.{extension.lower().lstrip('.')}"
+        path = media_path(name)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+            return StoredMedia(name, sha256, size, False)
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        return StoredMedia(name, sha256, size, True)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) of a single byte range, or None to send the whole file.
+
+    Multi-range and malformed headers are ignored as RFC 9110 allows, so the
+    client gets a full 200 response instead.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise RangeNotSatisfiable()
+            start, end = max(size - length, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+class MediaFileResponse(Response):
+    """Serve all or part of a stored file.
+
+    Uses the ASGI zero-copy send extension when the server offers it, so the
+    kernel copies the file straight to the socket; otherwise it streams the
+    selected bytes in chunks from a worker thread.
+    """
+
+    def __init__(self, path: str, name: str, size: int, byte_range: Optional[Tuple[int, int]], method: str):
+        self.path = path
+        self.send_header_only = method == "HEAD"
+        start, end = byte_range if byte_range is not None else (0, size - 1)
+        self.offset = start
+        self.count = end - start + 1 if size else 0
+
+        headers = {
+            "accept-ranges": "bytes",
+            "cache-control": IMMUTABLE_CACHE_CONTROL,
+            "etag": media_etag(name),
+            "content-length": str(self.count),
+        }
+        if byte_range is not None:
+            headers["content-range"] = f"bytes {start}-{end}/{size}"
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        super().__init__(
+            status_code=206 if byte_range is not None else 200,
+            headers=headers,
+            media_type=media_type
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.send_header_only or not self.count:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.fileno(),
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False
+                })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.offset)
+            remaining = self.count
+            while remaining:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining:
+                # The file was truncated under us; end the body anyway
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+class UploadLimitMiddleware:
+    """Bound the request body of media uploads before it is parsed.
+
+    Starlette spools the whole multipart body to disk before the route runs,
+    so the size check in store_media alone would not limit disk use or
+    bandwidth. Requests declaring a larger Content-Length are refused up
+    front, and bodies sent without one are cut off once they exceed it.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not UPLOAD_PATH.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        limit = settings.MEDIA_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD
+        detail = f"Media files are limited to {settings.MEDIA_MAX_UPLOAD_BYTES} bytes"
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse({"detail": detail}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # Raised while the route reads its form, so it becomes the response
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,229 @@
+import bisect
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from starlette.routing import Match
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Latency histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Label used for requests that match no route, to keep label cardinality bounded
+UNMATCHED_ROUTE = "unmatched"
+
+class RequestStats:
+    """Database work done while serving one request."""
+    __slots__ = ("queries", "query_seconds", "statements")
+
+    def __init__(self, profile: bool = False):
+        self.queries = 0
+        self.query_seconds = 0.0
+        # Statement fingerprint counts, only collected when profiling
+        self.statements: Optional[Counter] = Counter() if profile else None
+
+    def repeated_statements(self, threshold: int) -> List[Tuple[str, int]]:
+        """Fingerprints executed at least threshold times, most repeated first."""
+        if not self.statements:
+            return []
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+_LITERAL_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"%\(\w+\)s|\$\d+|:\w+"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?, ...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """Normalize a SQL statement so executions differing only in literals compare equal."""
+    for pattern, replacement in _LITERAL_PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout."""
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Per-worker metrics. Only the event loop thread writes here, so there are no locks."""
+
+    def __init__(self):
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.in_flight: Dict[Tuple[str, str], int] = {}
+        self.db_queries: Dict[Tuple[str, str], int] = {}
+        self.db_seconds: Dict[Tuple[str, str], float] = {}
+        self.startup_seconds: Dict[str, float] = {}
+
+    def record(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        key = (method, route)
+        status_key = (method, route, str(status))
+        self.requests[status_key] = self.requests.get(status_key, 0) + 1
+        histogram = self.latency.get(key)
+        if histogram is None:
+            histogram = self.latency[key] = Histogram()
+        histogram.observe(seconds)
+        self.db_queries[key] = self.db_queries.get(key, 0) + stats.queries
+        self.db_seconds[key] = self.db_seconds.get(key, 0.0) + stats.query_seconds
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def labels(method, route, **extra):
+            pairs = [f'method="{method}"', f'route="{route}"']
+            pairs += [f'{name}="{value}"' for name, value in extra.items()]
+            return "{" + ",".join(pairs) + "}"
+
+        lines.append("# HELP http_requests_total Total HTTP requests by route template and status.")
+        lines.append("# TYPE http_requests_total counter")
+        for (method, route, status), value in sorted(self.requests.items()):
+            lines.append(f"http_requests_total{labels(method, route, status=status)} {value}")
+
+        lines.append("# HELP http_requests_in_flight Requests currently being served.")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        for (method, route), value in sorted(self.in_flight.items()):
+            lines.append(f"http_requests_in_flight{labels(method, route)} {value}")
+
+        lines.append("# HELP http_request_duration_seconds Request latency by route template.")
+        lines.append("# TYPE http_request_duration_seconds histogram")
+        for (method, route), histogram in sorted(self.latency.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                cumulative += count
+                lines.append(f"http_request_duration_seconds_bucket{labels(method, route, le=bound)} {cumulative}")
+            lines.append(f"http_request_duration_seconds_bucket{labels(method, route, le='+Inf')} {histogram.count}")
+            lines.append(f"http_request_duration_seconds_sum{labels(method, route)} {histogram.total:.6f}")
+            lines.append(f"http_request_duration_seconds_count{labels(method, route)} {histogram.count}")
+
+        lines.append("# HELP db_queries_total Database queries issued while serving requests.")
+        lines.append("# TYPE db_queries_total counter")
+        for (method, route), value in sorted(self.db_queries.items()):
+            lines.append(f"db_queries_total{labels(method, route)} {value}")
+
+        lines.append("# HELP db_query_duration_seconds_total Time spent in database queries while serving requests.")
+        lines.append("# TYPE db_query_duration_seconds_total counter")
+        for (method, route), value in sorted(self.db_seconds.items()):
+            lines.append(f"db_query_duration_seconds_total{labels(method, route)} {value:.6f}")
+
+        lines.append("# HELP app_startup_seconds Cold-start time of this worker by phase.")
+        lines.append("# TYPE app_startup_seconds gauge")
+        for phase, value in sorted(self.startup_seconds.items()):
+            lines.append(f'app_startup_seconds{{phase="{phase}"}} {value:.6f}')
+
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_time"].pop()
+    stats = _current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - started
+        if stats.statements is not None:
+            stats.statements[fingerprint(statement)] += 1
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    starts = exception_context.connection.info.get("query_start_time") if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+def instrument_engine(engine) -> None:
+    """Count queries and query time of a sync engine (or an async engine's sync_engine)."""
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def route_template(app, scope) -> str:
+    """Resolve the route template (e.g. /student/test-result/{test_id}) for a request."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", UNMATCHED_ROUTE)
+    return UNMATCHED_ROUTE
+
+def profile_headers(stats: RequestStats) -> List[Tuple[bytes, bytes]]:
+    """Response headers summarizing the SQL issued so far in a request."""
+    repeated = stats.repeated_statements(settings.SQL_N_PLUS_ONE_THRESHOLD)
+    return [
+        (b"x-sql-queries", str(stats.queries).encode()),
+        (b"x-sql-time-ms", f"{stats.query_seconds * 1000:.2f}".encode()),
+        (b"x-sql-repeated", str(repeated[0][1] if repeated else 0).encode()),
+    ]
+
+def log_profile(method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+    """Log one line per request and a warning for each likely N+1 pattern."""
+    logger.info(
+        "%s %s %s in %.1fms: %d queries, %.1fms SQL",
+        method, route, status, seconds * 1000, stats.queries, stats.query_seconds * 1000
+    )
+    for statement, count in stats.repeated_statements(settings.SQL_N_PLUS_ONE_THRESHOLD):
+        logger.warning("Possible N+1 in %s %s: %dx %s", method, route, count, statement)
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, in-flight gauges, latency and DB usage per route."""
+
+    def __init__(self, app, router_app=None, profile: Optional[bool] = None):
+        self.app = app
+        self.router_app = router_app
+        self.profile = settings.SQL_PROFILING if profile is None else profile
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.router_app, scope) if self.router_app else UNMATCHED_ROUTE
+        key = (method, route)
+        status_code = 500
+        stats = RequestStats(self.profile)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.profile:
+                    message["headers"] = list(message.get("headers", [])) + profile_headers(stats)
+            await send(message)
+
+        token = _current_request.set(stats)
+        registry.in_flight[key] = registry.in_flight.get(key, 0) + 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            registry.in_flight[key] -= 1
+            elapsed = time.perf_counter() - start
+            registry.record(method, route, status_code, elapsed, stats)
+            _current_request.reset(token)
+            if self.profile:
+                log_profile(method, route, status_code, elapsed, stats)
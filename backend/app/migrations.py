@@ -0,0 +1,98 @@
+from typing import List
+from sqlalchemy import func, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from . import models
+from .answers import pack_legacy_answers
+
+# Columns added to existing tables after the initial schema
+NEW_COLUMNS = [
+    models.Test.__table__.c.version,
+    models.StudentAttempt.__table__.c.answer_vector,
+    models.StudentAttempt.__table__.c.idempotency_key,
+]
+
+# Indexes added after the initial schema. create_all only creates indexes for
+# new tables, so existing databases pick these up through upgrade().
+HOT_PATH_INDEXES = [
+    index
+    for table in (models.Test.__table__, models.Question.__table__, models.StudentAttempt.__table__)
+    for index in table.indexes
+    if index.name in (
+        "ix_tests_class_id_is_active",
+        "ix_questions_test_id",
+        "uq_student_attempts_test_roll_section",
+    )
+]
+
+def add_missing_columns(engine: Engine) -> List[str]:
+    """Add NEW_COLUMNS that an existing table lacks; only columns with a server default are NOT NULL."""
+    inspector = inspect(engine)
+    added = []
+    for column in NEW_COLUMNS:
+        existing = {c["name"] for c in inspector.get_columns(column.table.name)}
+        if column.name in existing:
+            continue
+        column_type = column.type.compile(dialect=engine.dialect)
+        if column.server_default is not None:
+            # Existing rows take the default, so the column can be NOT NULL
+            column_type += f" NOT NULL DEFAULT {column.server_default.arg}"
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column_type}"))
+        added.append(f"{column.table.name}.{column.name}")
+    return added
+
+def remove_duplicate_attempts(db: Session) -> int:
+    """Delete repeat attempts for the same (test_id, roll_no, section), keeping the first one."""
+    first_ids = db.query(func.min(models.StudentAttempt.id)).group_by(
+        models.StudentAttempt.test_id,
+        models.StudentAttempt.roll_no,
+        models.StudentAttempt.section
+    )
+    removed = db.query(models.StudentAttempt).filter(
+        models.StudentAttempt.id.notin_(first_ids)
+    ).delete(synchronize_session=False)
+    db.commit()
+    return removed
+
+def upgrade(engine: Engine) -> dict:
+    """Bring an existing database up to the current schema. Safe to run repeatedly."""
+    models.Base.metadata.create_all(bind=engine)
+    added = add_missing_columns(engine)
+
+    # The unique index cannot be built while duplicates exist
+    with Session(bind=engine) as db:
+        removed = remove_duplicate_attempts(db)
+
+    for index in HOT_PATH_INDEXES:
+        index.create(bind=engine, checkfirst=True)
+
+    with Session(bind=engine) as db:
+        packed = pack_legacy_answers(db)
+
+    return {
+        "columns_added": added,
+        "duplicate_attempts_removed": removed,
+        "indexes": [index.name for index in HOT_PATH_INDEXES],
+        "answers_packed": packed
+    }
+
+def run() -> None:
+    """Upgrade the configured database and report what changed."""
+    from .database import engine
+
+    result = upgrade(engine)
+    if result["columns_added"]:
+        print(f"Added columns: {', '.join(result['columns_added'])}")
+    print(f"Ensured indexes: {', '.join(result['indexes'])}")
+    if result["answers_packed"]:
+        print(f"Packed answers of {result['answers_packed']} attempts")
+    if result["duplicate_attempts_removed"]:
+        print(
+            f"Removed {result['duplicate_attempts_removed']} duplicate attempts; "
+            "run `python -m app.aggregates` to refresh performance aggregates"
+        )
+
+if __name__ == "__main__":
+    # Upgrade an existing database: python -m app.migrations
+    run()
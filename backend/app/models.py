@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, JSON, Table
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, LargeBinary, String, DateTime, JSON, Table, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -58,17 +58,24 @@ class Test(Base):
     test_date = Column(DateTime)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Bumped by cache.invalidate_test; per-test caches in every worker compare against it
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Relationships
     class_ref = relationship("Class", back_populates="tests")
     questions = relationship("Question", back_populates="test_ref")
     student_attempts = relationship("StudentAttempt", back_populates="test_ref")
+    
+    __table_args__ = (
+        # Active test lookup in start_test
+        Index("ix_tests_class_id_is_active", "class_id", "is_active"),
+    )
 
 class Question(Base):
     __tablename__ = "questions"
     
     id = Column(Integer, primary_key=True, index=True)
-    test_id = Column(Integer, ForeignKey("tests.id"))
+    test_id = Column(Integer, ForeignKey("tests.id"), index=True)
     teacher_id = Column(Integer, ForeignKey("teachers.id"))
     question_text = Column(String)
     question_type = Column(String)  # text, image, video, or audio
@@ -88,9 +95,35 @@ class StudentAttempt(Base):
     roll_no = Column(String)
     student_name = Column(String)
     section = Column(String)
-    answers = Column(JSON)  # Store answers as JSON
+    answers = Column(JSON(none_as_null=True))  # Legacy JSON answers, see answer_vector
+    answer_vector = Column(LargeBinary)  # One byte per question, packed by app.answers
+    idempotency_key = Column(String, nullable=True)  # Idempotency-Key of the submission
     score = Column(Integer)
     completed_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
     test_ref = relationship("Test", back_populates="student_attempts")
+    
+    __table_args__ = (
+        # One attempt per student per test; also serves the attempt lookups
+        Index("uq_student_attempts_test_roll_section", "test_id", "roll_no", "section", unique=True),
+    )
+
+class ClassPerformance(Base):
+    __tablename__ = "class_performance"
+    
+    class_id = Column(Integer, ForeignKey("classes.id"), primary_key=True)
+    attempt_count = Column(Integer, default=0)
+    score_sum = Column(Integer, default=0)
+    top_performers = Column(JSON)  # Bounded top-K list, best first
+
+class AnswerCheckpoint(Base):
+    __tablename__ = "answer_checkpoints"
+    
+    # Latest autosaved answers of an exam in progress; deleted on submit
+    test_id = Column(Integer, ForeignKey("tests.id"), primary_key=True)
+    roll_no = Column(String, primary_key=True)
+    section = Column(String, primary_key=True)
+    student_name = Column(String)
+    answer_vector = Column(LargeBinary)  # Same layout as StudentAttempt.answer_vector
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,48 @@
+from typing import List, Optional
+from fastapi import Query, Request, Response
+from sqlalchemy.orm import Query as SQLQuery
+
+MAX_PAGE_SIZE = 1000
+
+class Page:
+    """Keyset pagination over an ascending id column.
+
+    Each page seeks past the last id of the previous one, so its cost does
+    not grow with how deep the client has paged, unlike OFFSET. The cursor
+    for the next page goes in the X-Next-Cursor and Link headers, which
+    keeps the response body a plain list.
+
+    Paging is opt-in: without a limit every row is returned, as before.
+    """
+    __slots__ = ("request", "response", "after", "limit")
+
+    def __init__(self, request: Request, response: Response, after: Optional[int], limit: Optional[int]):
+        self.request = request
+        self.response = response
+        self.after = after
+        self.limit = limit
+
+    def apply(self, query: SQLQuery, id_column) -> List:
+        """Fetch one page of query ordered by id_column and set the next-page headers."""
+        if self.after is not None:
+            query = query.filter(id_column > self.after)
+        if self.limit is None:
+            return query.order_by(id_column).all()
+        # One extra row tells whether another page exists
+        rows = query.order_by(id_column).limit(self.limit + 1).all()
+        if len(rows) > self.limit:
+            rows = rows[:self.limit]
+            cursor = rows[-1].id
+            next_url = self.request.url.include_query_params(after=cursor, limit=self.limit)
+            self.response.headers["X-Next-Cursor"] = str(cursor)
+            self.response.headers["Link"] = f'<{next_url}>; rel="next"'
+        return rows
+
+def get_page(
+    request: Request,
+    response: Response,
+    after: Optional[int] = Query(None, description="Return rows with an id greater than this cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit to get every row")
+) -> Page:
+    """Dependency reading the after/limit query parameters."""
+    return Page(request, response, after, limit)
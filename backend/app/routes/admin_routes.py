@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, utils
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, selectinload
+from typing import List, Optional
+from .. import aggregates, bulk, export, models, schemas, utils
+from ..cache import cache_stats, invalidate_test, teacher_access_cache
+from ..checkpoints import checkpoint_buffer
+from ..live import live_response
+from ..pagination import Page, get_page
 from ..database import get_db
 from ..utils import get_current_user
 from datetime import datetime
@@ -32,7 +37,7 @@ async def create_teacher(
         )
     
     # Create new teacher
-    hashed_password = utils.get_password_hash(teacher.password)
+    hashed_password = await utils.get_password_hash_async(teacher.password)
     db_teacher = models.Teacher(
         username=teacher.username,
         password_hash=hashed_password
@@ -52,24 +57,51 @@ async def create_teacher(
     db.add(db_teacher)
     db.commit()
     db.refresh(db_teacher)
+    teacher_access_cache.invalidate(db_teacher.username)
     
     return db_teacher
 
-@router.get("/classes", response_model=List[schemas.ClassBase])
+@router.post("/provision")
+async def provision_roster(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Create teachers, classes and subjects in bulk from a CSV or JSON roster."""
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can provision teachers"
+        )
+    
+    body = (await request.body()).decode("utf-8-sig")
+    try:
+        roster = bulk.parse_roster(body, is_csv="csv" in request.headers.get("content-type", ""))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Roster must be CSV or JSON"
+        )
+    
+    # Hashing and batched inserts block, so keep them off the event loop
+    return await run_in_threadpool(bulk.provision_roster, db, roster)
+
+@router.get("/classes", response_model=List[schemas.ClassResponse])
 async def get_classes(
+    page: Page = Depends(get_page),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get list of all classes."""
+    """Get a page of classes."""
     if current_user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can view classes"
         )
-    classes = db.query(models.Class).all()
-    return [schemas.ClassBase.from_orm(c) for c in classes]
+    classes = page.apply(db.query(models.Class), models.Class.id)
+    return [schemas.ClassResponse.from_orm(c) for c in classes]
 
-@router.post("/classes", response_model=schemas.ClassBase)
+@router.post("/classes", response_model=schemas.ClassResponse)
 async def create_class(
     class_data: schemas.ClassBase,
     db: Session = Depends(get_db),
@@ -87,50 +119,59 @@ async def create_class(
     db.refresh(db_class)
     return db_class
 
- @router.get("/subjects", response_model=List[schemas.SubjectBase])
- async def get_subjects(
-     db: Session = Depends(get_db),
-     current_user: dict = Depends(get_current_user)
- ):
-     """Get list of all subjects."""
-     if current_user["role"] != "admin":
-         raise HTTPException(
-             status_code=status.HTTP_403_FORBIDDEN,
-             detail="Only admins can view subjects"
-         )
-     subjects = db.query(models.Subject).all()
-     return [schemas.SubjectBase.from_orm(s) for s in subjects]
+@router.get("/subjects", response_model=List[schemas.SubjectResponse])
+async def get_subjects(
+    page: Page = Depends(get_page),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a page of subjects."""
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view subjects"
+        )
+    subjects = page.apply(db.query(models.Subject), models.Subject.id)
+    return [schemas.SubjectResponse.from_orm(s) for s in subjects]
 
-+@router.post("/subjects", response_model=schemas.SubjectBase)
-+async def create_subject(
-+    subject_data: schemas.SubjectBase,
-+    db: Session = Depends(get_db),
-+    current_user: dict = Depends(get_current_user)
-+):
-+    """Create a new subject."""
-+    if current_user["role"] != "admin":
-+        raise HTTPException(
-+            status_code=status.HTTP_403_FORBIDDEN,
-+            detail="Only admins can create subjects"
-+        )
-+    db_subject = models.Subject(name=subject_data.name)
-+    db.add(db_subject)
-+    db.commit()
-+    db.refresh(db_subject)
-+    return db_subject
+@router.post("/subjects", response_model=schemas.SubjectResponse)
+async def create_subject(
+    subject_data: schemas.SubjectBase,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Create a new subject."""
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can create subjects"
+        )
+    db_subject = models.Subject(name=subject_data.name)
+    db.add(db_subject)
+    db.commit()
+    db.refresh(db_subject)
+    return db_subject
 
 @router.get("/teachers", response_model=List[schemas.TeacherResponse])
 async def get_teachers(
+    page: Page = Depends(get_page),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get list of all teachers."""
+    """Get a page of teachers with their classes and subjects."""
     if current_user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only admins can view teachers"
         )
-    teachers = db.query(models.Teacher).all()
+    # Load assignments for the whole page in two queries instead of two per teacher
+    teachers = page.apply(
+        db.query(models.Teacher).options(
+            selectinload(models.Teacher.classes),
+            selectinload(models.Teacher.subjects)
+        ),
+        models.Teacher.id
+    )
     return [schemas.TeacherResponse.from_orm(t) for t in teachers]
 
 @router.post("/tests", response_model=schemas.TestResponse)
@@ -192,10 +233,131 @@ async def update_test_status(
         )
     
     test.is_active = is_active
+    invalidate_test(db, test_id)
     db.commit()
     
     return {"message": "Test status updated successfully"}
 
+@router.get("/cache-stats")
+async def get_cache_stats(
+    current_user: dict = Depends(get_current_user)
+):
+    """Get hit/miss counters for the in-process caches."""
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view cache statistics"
+        )
+    
+    return cache_stats()
+
+@router.get("/password-pool-stats")
+async def get_password_pool_stats(
+    current_user: dict = Depends(get_current_user)
+):
+    """Get queueing metrics for the password hashing worker pool."""
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view password pool statistics"
+        )
+    
+    return utils.password_pool.stats()
+
+@router.get("/checkpoint-stats")
+async def get_checkpoint_stats(
+    current_user: dict = Depends(get_current_user)
+):
+    """Get counters for the answer checkpoint write buffer."""
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view checkpoint statistics"
+        )
+    
+    return checkpoint_buffer.stats()
+
+@router.get("/tests/{test_id}/export")
+async def export_test_attempts(
+    test_id: int,
+    fmt: str = Query("csv", alias="format", regex="^(csv|ndjson)$"),
+    gzip: bool = False,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream all attempts of a test as CSV or NDJSON."""
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can export test results"
+        )
+    
+    test = db.query(models.Test.id).filter(models.Test.id == test_id).first()
+    if not test:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Test not found"
+        )
+    
+    # The export reads through its own session; do not hold this connection
+    # for as long as the download runs
+    db.close()
+    
+    return export.export_attempts_response(test_id, fmt, gzip)
+
+@router.get("/tests/{test_id}/item-analysis")
+async def get_item_analysis(
+    test_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get difficulty, discrimination and distractor statistics for a test."""
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view item analysis"
+        )
+    
+    test = db.query(models.Test.id, models.Test.version).filter(models.Test.id == test_id).first()
+    if not test:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Test not found"
+        )
+    
+    # Imported here so workers only load NumPy once an analysis is requested
+    from ..analysis import get_item_analysis
+    
+    # The NumPy work is CPU bound; keep it off the event loop
+    return await run_in_threadpool(get_item_analysis, db, test_id, test.version)
+
+@router.get("/tests/{test_id}/live")
+async def stream_test_progress(
+    test_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream live started/submitted counts and average score of a test as server-sent events."""
+    if current_user["role"] != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can monitor tests"
+        )
+    
+    test = db.query(models.Test.id).filter(models.Test.id == test_id).first()
+    if not test:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Test not found"
+        )
+    
+    # The stream outlives the request; return the connection to the pool now
+    # instead of holding it until the viewer disconnects
+    db.close()
+    
+    return live_response(request, test_id)
+
 @router.get("/performance", response_model=List[schemas.PerformanceResponse])
 async def get_class_performance(
     db: Session = Depends(get_db),
@@ -208,32 +370,31 @@ async def get_class_performance(
             detail="Only admins can view performance statistics"
         )
     
-    classes = db.query(models.Class).all()
-    performance_stats = []
-    
-    for class_ in classes:
-        # Get all attempts for tests in this class
-        attempts = db.query(models.StudentAttempt).join(
-            models.Test
-        ).filter(
-            models.Test.class_id == class_.id
-        ).all()
-        
-        stats = utils.generate_class_performance_stats(attempts)
-        performance_stats.append({
-            "class_name": class_.name,
-            **stats
-        })
+    # Read the materialized aggregates for every class in one query
+    rows = db.query(models.Class, models.ClassPerformance).outerjoin(
+        models.ClassPerformance,
+        models.ClassPerformance.class_id == models.Class.id
+    ).all()
     
-    return performance_stats
+    return [
+        {
+            "class_name": class_.name,
+            **aggregates.performance_stats(aggregate)
+        }
+        for class_, aggregate in rows
+    ]
 
 @router.get("/toppers/{class_id}")
 async def get_class_toppers(
     class_id: int,
+    k: int = Query(3, ge=1, le=100),
+    section: Optional[str] = None,
+    subject_id: Optional[int] = None,
+    test_id: Optional[int] = None,
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get top three performers for a specific class."""
+    """Get top k performers for a class, optionally narrowed to a section, subject or test."""
     if current_user["role"] != "admin":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -247,16 +408,27 @@ async def get_class_toppers(
             detail="Class not found"
         )
     
-    # Get all attempts for this class
-    attempts = db.query(models.StudentAttempt).join(
+    # Stream only the columns needed for ranking
+    attempts = db.query(
+        models.StudentAttempt.student_name,
+        models.StudentAttempt.roll_no,
+        models.StudentAttempt.score
+    ).join(
         models.Test
     ).filter(
         models.Test.class_id == class_id
-    ).all()
+    )
+    
+    if section is not None:
+        attempts = attempts.filter(models.StudentAttempt.section == section)
+    if subject_id is not None:
+        attempts = attempts.filter(models.Test.subject_id == subject_id)
+    if test_id is not None:
+        attempts = attempts.filter(models.StudentAttempt.test_id == test_id)
     
-    stats = utils.generate_class_performance_stats(attempts)
+    attempts = attempts.order_by(models.StudentAttempt.id).yield_per(1000)
     
     return {
         "class_name": class_.name,
-        "toppers": stats["top_performers"]
+        "toppers": utils.select_top_performers(attempts, k)
     }
@@ -0,0 +1,51 @@
+import os
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from .. import media, utils
+from ..config import settings
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+@router.api_route("/{name}", methods=["GET", "HEAD"])
+async def get_media(
+    name: str,
+    request: Request,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_none_match: Optional[str] = Header(None)
+):
+    """Serve uploaded media with range support and immutable caching."""
+    if not media.MEDIA_NAME.match(name):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+
+    path = media.media_path(name)
+    try:
+        size = (await run_in_threadpool(os.stat, path)).st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Media not found")
+
+    # The name is the content hash, so a matching ETag never goes stale
+    etag = media.media_etag(name)
+    if utils.etag_matches(if_none_match, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, "Cache-Control": media.IMMUTABLE_CACHE_CONTROL}
+        )
+
+    # Let nginx send the file itself; it handles ranges and sendfile
+    if settings.MEDIA_ACCEL_REDIRECT:
+        return Response(headers={
+            "X-Accel-Redirect": f"{settings.MEDIA_ACCEL_REDIRECT.rstrip('/')}/{name[:2]}/{name[2:4]}/{name}",
+            "ETag": etag,
+            "Cache-Control": media.IMMUTABLE_CACHE_CONTROL
+        })
+
+    try:
+        byte_range = media.parse_range(range_header, size)
+    except media.RangeNotSatisfiable:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+
+    return media.MediaFileResponse(path, name, size, byte_range, request.method)
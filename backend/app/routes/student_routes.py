@@ -1,24 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, utils
-from ..database import get_db
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from sqlalchemy import exists, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from .. import aggregates, models, schemas, shuffle, utils
+from ..answers import pack_answers, unpack_answers
+from ..cache import answer_key_cache, paper_cache
+from ..checkpoints import apply_changes, checkpoint_buffer
+from ..live import live_monitor
+from ..config import settings
+from ..database import async_write_guard, get_async_db, insert_ignoring_conflicts
 from datetime import datetime
 
 router = APIRouter(prefix="/student", tags=["student"])
 
+async def load_answer_key(db: AsyncSession, test_id: int) -> dict:
+    """Load the answer key of a test as {str(question_id): correct_option}, in answer vector order."""
+    rows = (await db.execute(
+        select(models.Question.id, models.Question.correct_option).where(
+            models.Question.test_id == test_id
+        ).order_by(models.Question.id)
+    )).all()
+    return {str(question_id): correct_option for question_id, correct_option in rows}
+
+async def load_test_version(db: AsyncSession, test_id: int) -> Optional[int]:
+    """Get the version stamp of a test for endpoints that do not load the test itself."""
+    return (await db.execute(
+        select(models.Test.version).where(models.Test.id == test_id)
+    )).scalar()
+
+async def render_paper(db: AsyncSession, test_id: int) -> Optional[shuffle.Paper]:
+    """Render the sanitized exam paper of a test, shared by all of its students."""
+    questions = (await db.execute(
+        select(models.Question).where(
+            models.Question.test_id == test_id
+        ).order_by(models.Question.id)
+    )).scalars().all()
+    
+    if not questions:
+        return None
+    
+    # QuestionResponse has no correct_option field, so it never reaches the paper
+    return shuffle.build_paper(
+        test_id,
+        [schemas.QuestionResponse.from_orm(q) for q in questions],
+        duration_minutes=60  # Can be made configurable
+    )
+
 @router.post("/start-test", response_model=schemas.StudentTestResponse)
 async def start_test(
     student_info: schemas.StudentTestStart,
     class_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    if_none_match: Optional[str] = Header(None)
 ):
     """Start a test for a student."""
     # Get active test for the class
-    test = db.query(models.Test).filter(
-        models.Test.class_id == class_id,
-        models.Test.is_active == True
-    ).first()
+    test = (await db.execute(
+        select(models.Test).where(
+            models.Test.class_id == class_id,
+            models.Test.is_active == True
+        ).limit(1)
+    )).scalars().first()
     
     if not test:
         raise HTTPException(
@@ -27,11 +70,13 @@ async def start_test(
         )
     
     # Check if student has already attempted this test
-    existing_attempt = db.query(models.StudentAttempt).filter(
-        models.StudentAttempt.test_id == test.id,
-        models.StudentAttempt.roll_no == student_info.roll_no,
-        models.StudentAttempt.section == student_info.section
-    ).first()
+    existing_attempt = (await db.execute(
+        select(models.StudentAttempt.id).where(
+            models.StudentAttempt.test_id == test.id,
+            models.StudentAttempt.roll_no == student_info.roll_no,
+            models.StudentAttempt.section == student_info.section
+        ).limit(1)
+    )).scalar()
     
     if existing_attempt:
         raise HTTPException(
@@ -39,38 +84,81 @@ async def start_test(
             detail="You have already attempted this test"
         )
     
-    # Get questions for the test
-    questions = db.query(models.Question).filter(
-        models.Question.test_id == test.id
-    ).all()
+    # The paper is rendered once per test version and cached; each student
+    # gets it in their own order, assembled from the cached fragments
+    paper = await paper_cache.get_or_load_async(test.id, test.version, lambda: render_paper(db, test.id))
     
-    if not questions:
+    if not paper:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No questions found for this test"
         )
     
-    # Remove correct_option from questions
-    for question in questions:
-        question.correct_option = None
+    live_monitor.publish_started(test.id, student_info.roll_no, student_info.section)
+    
+    if settings.SHUFFLE_PAPERS:
+        seed = shuffle.student_seed(test.id, student_info.roll_no, student_info.section)
+        etag = shuffle.student_etag(paper, seed)
+    else:
+        etag = paper.etag
+    
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if utils.etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    body = shuffle.render_for_student(paper, seed) if settings.SHUFFLE_PAPERS else paper.body
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def find_submission(db: AsyncSession, test_id: int, roll_no: str, section: str):
+    """Look up what is needed to replay a stored submission, without loading answers."""
+    return (await db.execute(
+        select(
+            models.StudentAttempt.idempotency_key,
+            models.StudentAttempt.score,
+            func.length(models.StudentAttempt.answer_vector).label("total_questions")
+        ).where(
+            models.StudentAttempt.test_id == test_id,
+            models.StudentAttempt.roll_no == roll_no,
+            models.StudentAttempt.section == section
+        ).limit(1)
+    )).first()
+
+def replay_submission(existing, idempotency_key: Optional[str], response: Response) -> dict:
+    """Return the stored result for a retried submission, or reject a second one."""
+    if existing is None or idempotency_key is None or existing.idempotency_key != idempotency_key:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have already submitted this test"
+        )
     
+    response.headers["Idempotent-Replayed"] = "true"
     return {
-        "test_id": test.id,
-        "questions": questions,
-        "duration_minutes": 60  # Can be made configurable
+        "message": "Test submitted successfully",
+        "score": existing.score,
+        "total_questions": existing.total_questions or 0
     }
 
 @router.post("/submit-test")
 async def submit_test(
     submission: schemas.StudentTestSubmit,
-    db: Session = Depends(get_db)
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
-    """Submit a test with answers."""
+    """Submit a test with answers. Retries with the same Idempotency-Key get the stored result."""
+    # Check if student has already submitted; a retry is answered from the
+    # stored row without rescoring
+    existing = await find_submission(db, submission.test_id, submission.roll_no, submission.section)
+    if existing:
+        return replay_submission(existing, idempotency_key, response)
+    
     # Verify test exists and is active
-    test = db.query(models.Test).filter(
-        models.Test.id == submission.test_id,
-        models.Test.is_active == True
-    ).first()
+    test = (await db.execute(
+        select(models.Test).where(
+            models.Test.id == submission.test_id,
+            models.Test.is_active == True
+        )
+    )).scalars().first()
     
     if not test:
         raise HTTPException(
@@ -78,49 +166,176 @@ async def submit_test(
             detail="Test not found or inactive"
         )
     
-    # Check if student has already submitted
-    existing_submission = db.query(models.StudentAttempt).filter(
-        models.StudentAttempt.test_id == submission.test_id,
-        models.StudentAttempt.roll_no == submission.roll_no,
-        models.StudentAttempt.section == submission.section
-    ).first()
+    # Get correct answers (cached per test version)
+    correct_answers = await answer_key_cache.get_or_load_async(
+        submission.test_id,
+        test.version,
+        lambda: load_answer_key(db, submission.test_id)
+    )
     
-    if existing_submission:
+    if not correct_answers:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No questions found for this test"
+        )
+    
+    # Finalize from the autosaved checkpoint (stored row plus unwritten
+    # changes) with anything sent in the submission applied on top
+    key = (submission.test_id, submission.roll_no, submission.section)
+    checkpoint = await db.get(models.AnswerCheckpoint, key)
+    pending = checkpoint_buffer.pending_changes(key)
+    
+    if submission.answers is None and checkpoint is None and not pending:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="You have already submitted this test"
+            detail="No answers submitted and no checkpoint saved"
         )
     
-    # Get correct answers
-    questions = db.query(models.Question).filter(
-        models.Question.test_id == submission.test_id
-    ).all()
+    answers = unpack_answers(checkpoint.answer_vector or b"", correct_answers) if checkpoint else {}
+    answers = apply_changes(answers, pending)
+    answers.update(submission.answers or {})
     
-    correct_answers = {
-        str(q.id): q.correct_option for q in questions
-    }
+    # Answers (and checkpoints) refer to options in the order the student saw
+    # them; regenerate that order to map them back before scoring and storing
+    if settings.SHUFFLE_PAPERS:
+        paper = await paper_cache.get_or_load_async(
+            submission.test_id,
+            test.version,
+            lambda: render_paper(db, submission.test_id)
+        )
+        if paper:
+            seed = shuffle.student_seed(submission.test_id, submission.roll_no, submission.section)
+            answers = shuffle.unshuffle_answers(answers, paper, seed)
     
     # Calculate score
-    score = utils.calculate_score(submission.answers, correct_answers)
+    score = utils.calculate_score(answers, correct_answers)
     
     # Create student attempt record
-    student_attempt = models.StudentAttempt(
-        test_id=submission.test_id,
-        roll_no=submission.roll_no,
-        student_name=submission.student_name,
-        section=submission.section,
-        answers=submission.answers,
-        score=score,
-        completed_at=datetime.utcnow()
-    )
+    values = {
+        "test_id": submission.test_id,
+        "roll_no": submission.roll_no,
+        "student_name": submission.student_name,
+        "section": submission.section,
+        "answer_vector": pack_answers(answers, correct_answers),
+        "idempotency_key": idempotency_key,
+        "score": score,
+        "completed_at": datetime.utcnow()
+    }
+    
+    # Insert-or-skip on the unique (test_id, roll_no, section) index, so a
+    # concurrent duplicate loses cleanly instead of racing the check above
+    async with async_write_guard():
+        try:
+            result = await db.execute(
+                insert_ignoring_conflicts(
+                    models.StudentAttempt,
+                    ["test_id", "roll_no", "section"]
+                ).values(**values)
+            )
+            inserted = result.rowcount == 1
+        except IntegrityError:
+            inserted = False
+        
+        if inserted:
+            if checkpoint is not None:
+                await db.delete(checkpoint)
+            await db.run_sync(aggregates.record_attempt, test.class_id, models.StudentAttempt(**values))
+            await db.commit()
+        else:
+            await db.rollback()
     
-    db.add(student_attempt)
-    db.commit()
+    if not inserted:
+        existing = await find_submission(db, submission.test_id, submission.roll_no, submission.section)
+        return replay_submission(existing, idempotency_key, response)
+    
+    checkpoint_buffer.discard(key)
+    live_monitor.publish_submitted(submission.test_id, submission.roll_no, submission.section, score)
     
     return {
         "message": "Test submitted successfully",
         "score": score,
-        "total_questions": len(questions)
+        "total_questions": len(correct_answers)
+    }
+
+@router.post("/checkpoint", status_code=status.HTTP_202_ACCEPTED)
+async def save_checkpoint(
+    checkpoint: schemas.AnswerCheckpointSave,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Autosave changed answers of a test in progress."""
+    # One indexed lookup for the version stamp and whether the student has
+    # already submitted; the answer key itself is served from cache
+    test = (await db.execute(
+        select(
+            models.Test.version,
+            exists().where(
+                models.StudentAttempt.test_id == checkpoint.test_id,
+                models.StudentAttempt.roll_no == checkpoint.roll_no,
+                models.StudentAttempt.section == checkpoint.section
+            ).label("submitted")
+        ).where(models.Test.id == checkpoint.test_id)
+    )).first()
+    
+    if test and test.submitted:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have already submitted this test"
+        )
+    
+    answer_key = await answer_key_cache.get_or_load_async(
+        checkpoint.test_id,
+        test.version,
+        lambda: load_answer_key(db, checkpoint.test_id)
+    ) if test else None
+    
+    if not answer_key:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No questions found for this test"
+        )
+    
+    changes = {
+        question_id: option
+        for question_id, option in checkpoint.answers.items()
+        if question_id in answer_key
+    }
+    checkpoint_buffer.record(
+        (checkpoint.test_id, checkpoint.roll_no, checkpoint.section),
+        checkpoint.student_name,
+        changes
+    )
+    
+    return {"message": "Checkpoint saved", "answers_saved": len(changes)}
+
+@router.get("/checkpoint/{test_id}", response_model=schemas.AnswerCheckpointResponse)
+async def get_checkpoint(
+    test_id: int,
+    roll_no: str,
+    section: str,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the latest autosaved answers to resume a test."""
+    key = (test_id, roll_no, section)
+    checkpoint = await db.get(models.AnswerCheckpoint, key)
+    pending = checkpoint_buffer.pending_changes(key)
+    
+    if checkpoint is None and not pending:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No checkpoint found"
+        )
+    
+    answer_key = await answer_key_cache.get_or_load_async(
+        test_id,
+        await load_test_version(db, test_id),
+        lambda: load_answer_key(db, test_id)
+    )
+    answers = unpack_answers(checkpoint.answer_vector or b"", answer_key) if checkpoint else {}
+    
+    return {
+        "test_id": test_id,
+        "answers": apply_changes(answers, pending),
+        "saved_at": checkpoint.updated_at if checkpoint else None
     }
 
 @router.get("/test-result/{test_id}")
@@ -128,14 +343,16 @@ async def get_test_result(
     test_id: int,
     roll_no: str,
     section: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get test result for a student."""
-    attempt = db.query(models.StudentAttempt).filter(
-        models.StudentAttempt.test_id == test_id,
-        models.StudentAttempt.roll_no == roll_no,
-        models.StudentAttempt.section == section
-    ).first()
+    attempt = (await db.execute(
+        select(models.StudentAttempt).where(
+            models.StudentAttempt.test_id == test_id,
+            models.StudentAttempt.roll_no == roll_no,
+            models.StudentAttempt.section == section
+        ).limit(1)
+    )).scalars().first()
     
     if not attempt:
         raise HTTPException(
@@ -143,10 +360,13 @@ async def get_test_result(
             detail="No test submission found"
         )
     
-    test = db.query(models.Test).filter(models.Test.id == test_id).first()
-    total_questions = db.query(models.Question).filter(
-        models.Question.test_id == test_id
-    ).count()
+    # The answer key cache already knows the question count
+    answer_key = await answer_key_cache.get_or_load_async(
+        test_id,
+        await load_test_version(db, test_id),
+        lambda: load_answer_key(db, test_id)
+    )
+    total_questions = len(answer_key)
     
     return {
         "student_name": attempt.student_name,
@@ -1,14 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from .. import models, schemas, utils
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, selectinload
+from typing import FrozenSet, List, NamedTuple, Optional
+from .. import bulk, export, media, models, schemas, utils
+from ..live import live_response
+from ..pagination import Page, get_page
+from ..cache import invalidate_test, teacher_access_cache
 from ..database import get_db
-from ..utils import get_current_user, verify_password, create_access_token
+from ..utils import get_current_user, verify_password_async, create_access_token
 from datetime import timedelta
 from ..config import settings
 
 router = APIRouter(prefix="/teacher", tags=["teacher"])
 
+class TeacherAccess(NamedTuple):
+    """Frozen class and subject assignments of a teacher."""
+    teacher_id: int
+    class_ids: FrozenSet[int]
+    subject_ids: FrozenSet[int]
+
+    def can_access(self, test: models.Test) -> bool:
+        return test.class_id in self.class_ids and test.subject_id in self.subject_ids
+
+def load_teacher_access(db: Session, username: str) -> Optional[TeacherAccess]:
+    """Load a teacher's assignments with one query over teacher_class_subject."""
+    rows = db.query(
+        models.Teacher.id,
+        models.teacher_class_subject.c.class_id,
+        models.teacher_class_subject.c.subject_id
+    ).outerjoin(
+        models.teacher_class_subject,
+        models.teacher_class_subject.c.teacher_id == models.Teacher.id
+    ).filter(
+        models.Teacher.username == username
+    ).all()
+    
+    if not rows:
+        return None
+    
+    return TeacherAccess(
+        teacher_id=rows[0][0],
+        class_ids=frozenset(class_id for _, class_id, _ in rows if class_id is not None),
+        subject_ids=frozenset(subject_id for _, _, subject_id in rows if subject_id is not None)
+    )
+
+def get_teacher_access(db: Session, username: str) -> TeacherAccess:
+    """Get a teacher's cached assignments, raising 404 if the teacher does not exist."""
+    access = teacher_access_cache.get_or_load(
+        username,
+        lambda: load_teacher_access(db, username)
+    )
+    
+    if not access:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Teacher not found"
+        )
+    
+    return access
+
 @router.post("/login", response_model=schemas.Token)
 async def teacher_login(
     username: str,
@@ -20,7 +71,7 @@ async def teacher_login(
         models.Teacher.username == username
     ).first()
     
-    if not teacher or not verify_password(password, teacher.password_hash):
+    if not teacher or not await verify_password_async(password, teacher.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -37,32 +88,31 @@ async def teacher_login(
 
 @router.get("/tests", response_model=List[schemas.TestResponse])
 async def get_teacher_tests(
+    page: Page = Depends(get_page),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get all active tests for teacher's classes and subjects."""
+    """Get a page of active tests for teacher's classes and subjects."""
     if current_user["role"] != "teacher":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view tests"
         )
     
-    teacher = db.query(models.Teacher).filter(
-        models.Teacher.username == current_user["username"]
-    ).first()
+    access = get_teacher_access(db, current_user["username"])
     
-    if not teacher:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Teacher not found"
-        )
-    
-    # Get all active tests for teacher's classes and subjects
-    tests = db.query(models.Test).filter(
-        models.Test.class_id.in_([c.id for c in teacher.classes]),
-        models.Test.subject_id.in_([s.id for s in teacher.subjects]),
-        models.Test.is_active == True
-    ).all()
+    # Get active tests for teacher's classes and subjects, with the questions
+    # of the whole page loaded in one extra query
+    tests = page.apply(
+        db.query(models.Test).options(
+            selectinload(models.Test.questions)
+        ).filter(
+            models.Test.class_id.in_(access.class_ids),
+            models.Test.subject_id.in_(access.subject_ids),
+            models.Test.is_active == True
+        ),
+        models.Test.id
+    )
     
     return tests
 
@@ -79,9 +129,7 @@ async def add_question(
             detail="Only teachers can add questions"
         )
     
-    teacher = db.query(models.Teacher).filter(
-        models.Teacher.username == current_user["username"]
-    ).first()
+    access = get_teacher_access(db, current_user["username"])
     
     # Verify test exists and is active
     test = db.query(models.Test).filter(
@@ -96,8 +144,7 @@ async def add_question(
         )
     
     # Verify teacher is assigned to this class and subject
-    if test.class_id not in [c.id for c in teacher.classes] or \
-       test.subject_id not in [s.id for s in teacher.subjects]:
+    if not access.can_access(test):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to add questions to this test"
@@ -114,7 +161,7 @@ async def add_question(
     # Create question
     db_question = models.Question(
         test_id=question.test_id,
-        teacher_id=teacher.id,
+        teacher_id=access.teacher_id,
         question_text=question.question_text,
         question_type=question.question_type,
         media_url=question.media_url,
@@ -123,27 +170,166 @@ async def add_question(
     )
     
     db.add(db_question)
+    invalidate_test(db, question.test_id)
     db.commit()
     db.refresh(db_question)
     
     return db_question
 
+@router.post("/questions/{question_id}/media")
+async def upload_question_media(
+    question_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Upload a question's media into the content-addressed store and link it."""
+    if current_user["role"] != "teacher":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers can upload media"
+        )
+    
+    access = get_teacher_access(db, current_user["username"])
+    
+    question = db.query(models.Question).filter(models.Question.id == question_id).first()
+    if not question:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Question not found"
+        )
+    
+    # Verify teacher is assigned to this class and subject
+    if not access.can_access(question.test_ref):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to upload media for this question"
+        )
+    
+    # The stored name keeps the upload's extension, so validate it like a URL
+    filename = file.filename or ""
+    if not utils.validate_media_url(filename, question.question_type):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid media file for type {question.question_type}"
+        )
+    
+    try:
+        stored = await run_in_threadpool(media.store_media, file.file, filename.rsplit(".", 1)[-1])
+    except media.MediaTooLarge:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Media files are limited to {settings.MEDIA_MAX_UPLOAD_BYTES} bytes"
+        )
+    finally:
+        await file.close()
+    
+    question.media_url = f"{settings.MEDIA_BASE_URL.rstrip('/')}/media/{stored.name}"
+    invalidate_test(db, question.test_id)
+    db.commit()
+    
+    return {
+        "question_id": question.id,
+        "media_url": question.media_url,
+        "sha256": stored.sha256,
+        "size": stored.size,
+        "deduplicated": not stored.created
+    }
+
+@router.post("/tests/{test_id}/questions/bulk")
+async def import_questions(
+    test_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Import many questions into a test from a JSON array or a CSV body."""
+    if current_user["role"] != "teacher":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only teachers can add questions"
+        )
+    
+    access = get_teacher_access(db, current_user["username"])
+    
+    # Verify test exists and is active
+    test = db.query(models.Test).filter(
+        models.Test.id == test_id,
+        models.Test.is_active == True
+    ).first()
+    
+    if not test:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Test not found or inactive"
+        )
+    
+    # Verify teacher is assigned to this class and subject
+    if not access.can_access(test):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to add questions to this test"
+        )
+    
+    # Parse the body as CSV or a JSON array of questions
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "csv" in content_type:
+            rows = bulk.parse_question_csv((await request.body()).decode("utf-8-sig"))
+        else:
+            rows = await request.json()
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Body must be a JSON array or CSV"
+        )
+    
+    if not isinstance(rows, list) or not rows:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No questions to import"
+        )
+    
+    # Validate every row up front; nothing is inserted unless all rows are valid
+    questions, errors = bulk.validate_question_rows(rows)
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"message": "Some rows are invalid; nothing was imported", "errors": errors}
+        )
+    
+    # Insert every row with one executemany in a single transaction
+    db.execute(
+        insert(models.Question),
+        [
+            {
+                "test_id": test_id,
+                "teacher_id": access.teacher_id,
+                **question.dict()
+            }
+            for question in questions
+        ]
+    )
+    invalidate_test(db, test_id)
+    db.commit()
+    
+    return {"test_id": test_id, "imported": len(questions)}
+
 @router.get("/questions/{test_id}", response_model=List[schemas.QuestionResponse])
 async def get_test_questions(
     test_id: int,
+    page: Page = Depends(get_page),
     db: Session = Depends(get_db),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get all questions for a specific test."""
+    """Get a page of questions for a specific test."""
     if current_user["role"] != "teacher":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view questions"
         )
     
-    teacher = db.query(models.Teacher).filter(
-        models.Teacher.username == current_user["username"]
-    ).first()
+    access = get_teacher_access(db, current_user["username"])
     
     test = db.query(models.Test).filter(models.Test.id == test_id).first()
     if not test:
@@ -153,15 +339,125 @@ async def get_test_questions(
         )
     
     # Verify teacher is assigned to this class and subject
-    if test.class_id not in [c.id for c in teacher.classes] or \
-       test.subject_id not in [s.id for s in teacher.subjects]:
+    if not access.can_access(test):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized to view questions for this test"
         )
     
-    questions = db.query(models.Question).filter(
-        models.Question.test_id == test_id
-    ).all()
+    questions = page.apply(
+        db.query(models.Question).filter(
+            models.Question.test_id == test_id
+        ),
+        models.Question.id
+    )
     
     return questions
+
+@router.get("/tests/{test_id}/export")
+async def export_test_attempts(
+    test_id: int,
+    fmt: str = Query("csv", alias="format", regex="^(csv|ndjson)$"),
+    gzip: bool = False,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream all attempts of a test as CSV or NDJSON."""
+    if current_user["role"] != "teacher":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to export test results"
+        )
+    
+    access = get_teacher_access(db, current_user["username"])
+    
+    test = db.query(models.Test).filter(models.Test.id == test_id).first()
+    if not test:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Test not found"
+        )
+    
+    # Verify teacher is assigned to this class and subject
+    if not access.can_access(test):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to export results for this test"
+        )
+    
+    # The export reads through its own session; do not hold this connection
+    # for as long as the download runs
+    db.close()
+    
+    return export.export_attempts_response(test_id, fmt, gzip)
+
+@router.get("/tests/{test_id}/item-analysis")
+async def get_item_analysis(
+    test_id: int,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Get difficulty, discrimination and distractor statistics for a test."""
+    if current_user["role"] != "teacher":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view item analysis"
+        )
+    
+    access = get_teacher_access(db, current_user["username"])
+    
+    test = db.query(models.Test).filter(models.Test.id == test_id).first()
+    if not test:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Test not found"
+        )
+    
+    # Verify teacher is assigned to this class and subject
+    if not access.can_access(test):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to view item analysis for this test"
+        )
+    
+    # Imported here so workers only load NumPy once an analysis is requested
+    from ..analysis import get_item_analysis
+    
+    # The NumPy work is CPU bound; keep it off the event loop
+    return await run_in_threadpool(get_item_analysis, db, test_id, test.version)
+
+@router.get("/tests/{test_id}/live")
+async def stream_test_progress(
+    test_id: int,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream live started/submitted counts and average score of a test as server-sent events."""
+    if current_user["role"] != "teacher":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to monitor tests"
+        )
+    
+    access = get_teacher_access(db, current_user["username"])
+    
+    test = db.query(models.Test).filter(models.Test.id == test_id).first()
+    if not test:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Test not found"
+        )
+    
+    # Verify teacher is assigned to this class and subject
+    if not access.can_access(test):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to monitor this test"
+        )
+    
+    # The stream outlives the request; return the connection to the pool now
+    # instead of holding it until the viewer disconnects
+    db.close()
+    
+    return live_response(request, test_id)
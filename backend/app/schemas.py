@@ -37,6 +37,13 @@ class QuestionCreate(BaseModel):
     options: List[str]
     correct_option: int
 
+class QuestionImport(BaseModel):
+    question_text: str
+    question_type: str  # text, image, video, or audio
+    media_url: Optional[str] = None
+    options: List[str]
+    correct_option: int
+
 class StudentTestStart(BaseModel):
     roll_no: str
     student_name: str
@@ -47,7 +54,16 @@ class StudentTestSubmit(BaseModel):
     roll_no: str
     student_name: str
     section: str
-    answers: Dict[str, int]  # question_id: selected_option
+    # question_id: selected_option, applied over the autosaved checkpoint;
+    # omit to submit the checkpoint as-is
+    answers: Optional[Dict[str, int]] = None
+
+class AnswerCheckpointSave(BaseModel):
+    test_id: int
+    roll_no: str
+    student_name: str
+    section: str
+    answers: Dict[str, Optional[int]]  # Changed answers only; null clears an answer
 
 # Response Schemas
 class Token(BaseModel):
@@ -58,10 +74,22 @@ class TokenData(BaseModel):
     username: Optional[str] = None
     role: str
 
+class ClassResponse(ClassBase):
+    id: int
+
+    class Config:
+        orm_mode = True
+
+class SubjectResponse(SubjectBase):
+    id: int
+
+    class Config:
+        orm_mode = True
+
 class TeacherResponse(TeacherBase):
     id: int
-    classes: List[ClassBase]
-    subjects: List[SubjectBase]
+    classes: List[ClassResponse]
+    subjects: List[SubjectResponse]
 
     class Config:
         orm_mode = True
@@ -95,6 +123,11 @@ class StudentTestResponse(BaseModel):
     class Config:
         orm_mode = True
 
+class AnswerCheckpointResponse(BaseModel):
+    test_id: int
+    answers: Dict[str, int]
+    saved_at: Optional[datetime] = None
+
 class PerformanceResponse(BaseModel):
     class_name: str
     average_score: float
@@ -0,0 +1,86 @@
+import hashlib
+import hmac
+import json
+from typing import Dict, List, NamedTuple, Tuple
+from . import schemas, utils
+from .config import settings
+
+class Paper(NamedTuple):
+    """A rendered exam paper, shared by all students of a test.
+
+    Besides the canonical body it keeps every question pre-encoded as JSON up
+    to its options list, plus each option encoded on its own, so a shuffled
+    copy is assembled by joining strings rather than serializing again.
+    """
+    body: bytes
+    etag: str
+    head: str
+    tail: str
+    questions: List[Tuple[int, str, List[str]]]  # (question_id, JSON prefix, encoded options)
+
+def build_paper(test_id: int, questions: List[schemas.QuestionResponse], duration_minutes: int) -> Paper:
+    """Render a paper in question id order along with its pre-encoded fragments."""
+    body = schemas.StudentTestResponse(
+        test_id=test_id,
+        questions=questions,
+        duration_minutes=duration_minutes
+    ).json().encode()
+
+    fragments = []
+    for question in questions:
+        fields = question.dict()
+        options = fields.pop("options")
+        # options is the last field of QuestionResponse, so the prefix can stay open
+        prefix = json.dumps(fields)[:-1] + ', "options": ['
+        fragments.append((question.id, prefix, [json.dumps(option) for option in options]))
+
+    return Paper(
+        body=body,
+        etag=utils.make_etag(body),
+        head=json.dumps({"test_id": test_id})[:-1] + ', "questions": [',
+        tail=f'], "duration_minutes": {json.dumps(duration_minutes)}}}',
+        questions=fragments
+    )
+
+def student_seed(test_id: int, roll_no: str, section: str) -> str:
+    """Secret per-student seed; students cannot derive each other's layout."""
+    secret = (settings.SHUFFLE_SECRET or settings.SECRET_KEY).encode()
+    message = json.dumps([test_id, roll_no, section]).encode()
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+def _rank(seed: str, key: str) -> bytes:
+    """Pseudo-random sort key; sorting by it is a seeded shuffle."""
+    return hashlib.blake2b(f"{seed}:{key}".encode(), digest_size=8).digest()
+
+def option_order(seed: str, question_id: int, count: int) -> List[int]:
+    """Original option index shown at each position of a question.
+
+    Each option is ranked on its own, so adding a question never reorders
+    the options of the others mid-exam.
+    """
+    return sorted(range(count), key=lambda option: _rank(seed, f"{question_id}.{option}"))
+
+def student_etag(paper: Paper, seed: str) -> str:
+    """ETag of a student's shuffled copy, without rendering it."""
+    return utils.make_etag(f"{paper.etag}:{seed}".encode())
+
+def render_for_student(paper: Paper, seed: str) -> bytes:
+    """Assemble a student's copy with questions and options in their shuffled order."""
+    parts = []
+    for question_id, prefix, options in sorted(paper.questions, key=lambda q: _rank(seed, str(q[0]))):
+        shown = ", ".join(options[i] for i in option_order(seed, question_id, len(options)))
+        parts.append(prefix + shown + "]}")
+    return (paper.head + ", ".join(parts) + paper.tail).encode()
+
+def unshuffle_answers(answers: Dict[str, int], paper: Paper, seed: str) -> Dict[str, int]:
+    """Map answers given as displayed option positions back to original option indices."""
+    option_counts = {str(question_id): len(options) for question_id, _, options in paper.questions}
+    original = {}
+    for question_id, position in answers.items():
+        count = option_counts.get(str(question_id))
+        if count is not None and isinstance(position, int) and 0 <= position < count:
+            original[question_id] = option_order(seed, int(question_id), count)[position]
+        else:
+            # Unknown questions and out-of-range choices cannot score either way
+            original[question_id] = position
+    return original
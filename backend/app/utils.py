@@ -1,13 +1,23 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, Iterable, Optional
+import asyncio
+import hashlib
+import heapq
+import time
 from jose import JWTError, jwt
+from .cache import TokenCache
 from .config import settings
 from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
@@ -20,6 +30,73 @@ def get_password_hash(password: str) -> str:
     """Generate password hash."""
     return pwd_context.hash(password)
 
+class PasswordWorkerPool:
+    """Bounded thread pool that keeps bcrypt off the event loop."""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_pending = workers + max_queue
+        self.pending = 0
+        self.peak_pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+
+    async def run(self, func: Callable, *args):
+        """Run func in the pool, rejecting with 503 when the queue is full."""
+        # pending is only touched on the event loop thread, so no lock is needed
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many login requests, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        queued_at = time.perf_counter()
+
+        def job():
+            started_at = time.perf_counter()
+            result = func(*args)
+            return result, started_at - queued_at, time.perf_counter() - started_at
+
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        try:
+            result, wait, run = await asyncio.get_running_loop().run_in_executor(self._executor, job)
+        finally:
+            self.pending -= 1
+
+        self.completed += 1
+        self.total_wait_seconds += wait
+        self.total_run_seconds += run
+        return result
+
+    def stats(self) -> dict:
+        """Get queueing metrics for the pool."""
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "peak_pending": self.peak_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            "avg_run_ms": round(self.total_run_seconds / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+password_pool = PasswordWorkerPool(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_QUEUE)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash in the password worker pool."""
+    return await password_pool.run(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate password hash in the password worker pool."""
+    return await password_pool.run(get_password_hash, password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token."""
     to_encode = data.copy()
@@ -34,8 +111,27 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     
     return encoded_jwt
 
-async def get_current_user(token: str):
-    """Decode JWT token and return current user."""
+class Principal:
+    """Verified identity decoded from an access token."""
+    __slots__ = ("username", "role", "user_id", "expires_at")
+
+    def __init__(self, username: str, role: Optional[str], user_id: Optional[int], expires_at: float):
+        self.username = username
+        self.role = role
+        self.user_id = user_id
+        self.expires_at = expires_at
+
+    def as_dict(self) -> dict:
+        return {"username": self.username, "role": self.role}
+
+token_cache = TokenCache("token", settings.TOKEN_CACHE_SIZE, settings.TOKEN_CACHE_TTL_SECONDS)
+
+def decode_principal(token: str) -> Principal:
+    """Verify a JWT and return its principal, using the verified token cache."""
+    principal = token_cache.get(token)
+    if principal is not None:
+        return principal
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -45,17 +141,30 @@ async def get_current_user(token: str):
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
-        role: str = payload.get("role")
         
         if username is None:
             raise credentials_exception
-            
-        token_data = {"username": username, "role": role}
+        
+        principal = Principal(
+            username=username,
+            role=payload.get("role"),
+            user_id=payload.get("id"),
+            expires_at=float(payload.get("exp", 0))
+        )
         
     except JWTError:
         raise credentials_exception
-        
-    return token_data
+    
+    token_cache.put(token, principal, principal.expires_at)
+    return principal
+
+async def get_current_principal(token: str) -> Principal:
+    """Decode JWT token and return the current user as a Principal."""
+    return decode_principal(token)
+
+async def get_current_user(token: str):
+    """Decode JWT token and return current user."""
+    return decode_principal(token).as_dict()
 
 def calculate_score(student_answers: dict, correct_answers: dict) -> int:
     """Calculate student's score based on their answers."""
@@ -65,49 +174,36 @@ def calculate_score(student_answers: dict, correct_answers: dict) -> int:
             score += 1
     return score
 
+# Allowed media file extensions per question type
+MEDIA_EXTENSIONS = {
+    'image': ['.jpg', '.jpeg', '.png', '.gif'],
+    'video': ['.mp4', '.webm'],
+    'audio': ['.mp3', '.wav'],
+}
+
 def validate_media_url(url: str, media_type: str) -> bool:
     """Validate media URL based on type."""
-    allowed_image_extensions = ['.jpg', '.jpeg', '.png', '.gif']
-    allowed_video_extensions = ['.mp4', '.webm']
-    allowed_audio_extensions = ['.mp3', '.wav']
-    
     url_lower = url.lower()
-    
-    if media_type == 'image':
-        return any(url_lower.endswith(ext) for ext in allowed_image_extensions)
-    elif media_type == 'video':
-        return any(url_lower.endswith(ext) for ext in allowed_video_extensions)
-    elif media_type == 'audio':
-        return any(url_lower.endswith(ext) for ext in allowed_audio_extensions)
-    
-    return False
+    return any(url_lower.endswith(ext) for ext in MEDIA_EXTENSIONS.get(media_type, []))
 
-def generate_class_performance_stats(attempts: list) -> dict:
-    """Generate performance statistics for a class."""
-    if not attempts:
-        return {
-            "average_score": 0,
-            "total_students": 0,
-            "top_performers": []
-        }
-    
-    # Calculate average score
-    total_score = sum(attempt.score for attempt in attempts)
-    average_score = total_score / len(attempts)
-    
-    # Get top performers
-    sorted_attempts = sorted(attempts, key=lambda x: x.score, reverse=True)
-    top_performers = [
+def make_etag(body: bytes) -> str:
+    """Build a strong ETag from response bytes."""
+    return '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+def select_top_performers(attempts: Iterable, k: int = 3) -> list:
+    """Select the k highest scoring attempts in O(n log k); earlier attempts win ties."""
+    return [
         {
             "student_name": attempt.student_name,
             "roll_no": attempt.roll_no,
             "score": attempt.score
         }
-        for attempt in sorted_attempts[:3]
+        for attempt in heapq.nlargest(k, attempts, key=lambda x: x.score)
     ]
-    
-    return {
-        "average_score": round(average_score, 2),
-        "total_students": len(attempts),
-        "top_performers": top_performers
-    }
@@ -0,0 +1,215 @@
+"""Exam-start load test: many students start and then submit a test at once.
+
+Seeds a fresh SQLite database through the app models, then drives the real
+FastAPI app in-process over httpx's ASGI transport (pip install httpx).
+Run from the backend directory:
+
+    python -m benchmarks.exam_start --students 2000 --concurrency 200 --output results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def summarize(latencies, statuses, elapsed: float) -> dict:
+    """Throughput and latency percentiles (ms) for one endpoint."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "statuses": {str(code): statuses.count(code) for code in sorted(set(statuses))},
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+def seed(classes: int, questions: int) -> list:
+    """Create one active test per class with the given number of questions."""
+    from app import models
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        subject = models.Subject(name="Benchmark")
+        db.add(subject)
+        db.flush()
+        tests = []
+        for c in range(classes):
+            class_ = models.Class(name=f"Class {c + 1}")
+            db.add(class_)
+            db.flush()
+            test = models.Test(
+                class_id=class_.id,
+                subject_id=subject.id,
+                test_date=datetime.utcnow(),
+                is_active=True
+            )
+            db.add(test)
+            db.flush()
+            db.add_all([
+                models.Question(
+                    test_id=test.id,
+                    question_text=f"Question {q + 1}",
+                    question_type="text",
+                    options=["A", "B", "C", "D"],
+                    correct_option=q % 4
+                )
+                for q in range(questions)
+            ])
+            tests.append((class_.id, test.id))
+        db.commit()
+        return tests
+    finally:
+        db.close()
+
+async def run_phase(name, calls, concurrency: int) -> dict:
+    """Run request coroutines with bounded concurrency and summarize them."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    statuses = []
+
+    async def timed(call):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await call()
+            latencies.append(time.perf_counter() - start)
+            statuses.append(response.status_code)
+            return response
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(timed(call) for call in calls))
+    result = summarize(latencies, statuses, time.perf_counter() - start)
+    print(
+        f"{name:14} {result['requests']:6d} req  {result['throughput_rps']:8.1f} req/s  "
+        f"p50 {result['p50_ms']:8.2f}ms  p95 {result['p95_ms']:8.2f}ms  p99 {result['p99_ms']:8.2f}ms  "
+        f"statuses {result['statuses']}"
+    )
+    return result, responses
+
+async def drive(args, tests) -> dict:
+    import httpx
+    from app.main import app
+
+    rng = random.Random(args.seed)
+    students = [
+        {
+            "class_id": tests[i % len(tests)][0],
+            "test_id": tests[i % len(tests)][1],
+            "roll_no": str(i + 1),
+            "student_name": f"Student {i + 1}",
+            "section": "ABCD"[i % 4],
+        }
+        for i in range(args.students)
+    ]
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(app=app, base_url="http://benchmark", limits=limits) as client:
+        def start_call(s):
+            return lambda: client.post(
+                "/student/start-test",
+                params={"class_id": s["class_id"]},
+                json={"roll_no": s["roll_no"], "student_name": s["student_name"], "section": s["section"]},
+            )
+
+        start_result, papers = await run_phase(
+            "start-test", [start_call(s) for s in students], args.concurrency
+        )
+
+        def submit_call(s, paper):
+            questions = paper.json()["questions"] if paper.status_code == 200 else []
+            answers = {str(q["id"]): rng.randrange(len(q["options"])) for q in questions}
+            return lambda: client.post(
+                "/student/submit-test",
+                json={
+                    "test_id": s["test_id"],
+                    "roll_no": s["roll_no"],
+                    "student_name": s["student_name"],
+                    "section": s["section"],
+                    "answers": answers,
+                },
+            )
+
+        submit_result, _ = await run_phase(
+            "submit-test", [submit_call(s, p) for s, p in zip(students, papers)], args.concurrency
+        )
+
+        def result_call(s):
+            return lambda: client.get(
+                f"/student/test-result/{s['test_id']}",
+                params={"roll_no": s["roll_no"], "section": s["section"]},
+            )
+
+        result_result, _ = await run_phase(
+            "test-result", [result_call(s) for s in students], args.concurrency
+        )
+
+    return {
+        "/student/start-test": start_result,
+        "/student/submit-test": submit_result,
+        "/student/test-result/{test_id}": result_result,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--classes", type=int, default=4)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--label", default="", help="Free-form label stored with the results")
+    parser.add_argument("--output", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Point the app at a scratch database before anything imports it
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'benchmark.db')}"
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+        from app import models
+        from app.database import async_engine, engine
+        models.Base.metadata.create_all(bind=engine)
+
+        tests = seed(args.classes, args.questions)
+        print(f"Seeded {args.classes} tests x {args.questions} questions; {args.students} students, concurrency {args.concurrency}")
+
+        endpoints = asyncio.run(drive(args, tests))
+        asyncio.run(async_engine.dispose())
+        engine.dispose()
+
+    results = {
+        "label": args.label,
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "config": {
+            "students": args.students,
+            "classes": args.classes,
+            "questions": args.questions,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+        },
+        "endpoints": endpoints,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
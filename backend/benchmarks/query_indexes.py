@@ -0,0 +1,134 @@
+"""Latency of the student hot-path lookups with and without the composite indexes.
+
+Run from the backend directory:
+
+    python -m benchmarks.query_indexes --attempts 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import models
+from app.migrations import HOT_PATH_INDEXES
+
+def seed(engine, attempts: int, tests: int, questions_per_test: int) -> None:
+    """Bulk load classes, tests, questions and attempts through raw executemany."""
+    classes = max(1, tests // 5)
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.executemany(
+            "INSERT INTO classes (id, name) VALUES (?, ?)",
+            [(i, f"Class {i}") for i in range(1, classes + 1)]
+        )
+        cur.executemany(
+            "INSERT INTO tests (id, class_id, subject_id, is_active) VALUES (?, ?, ?, ?)",
+            [(i, (i - 1) % classes + 1, 1, i % 5 == 0) for i in range(1, tests + 1)]
+        )
+        cur.executemany(
+            "INSERT INTO questions (test_id, question_text, question_type, options, correct_option) "
+            "VALUES (?, ?, 'text', '[\"a\", \"b\", \"c\", \"d\"]', ?)",
+            [
+                (t, f"Question {q}", q % 4)
+                for t in range(1, tests + 1)
+                for q in range(questions_per_test)
+            ]
+        )
+        batch = []
+        for i in range(attempts):
+            batch.append((i % tests + 1, str(i // tests), "ABCD"[i % 4], "Student", "{}", i % 50))
+            if len(batch) == 50_000:
+                cur.executemany(
+                    "INSERT INTO student_attempts (test_id, roll_no, section, student_name, answers, score) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    batch
+                )
+                batch = []
+        if batch:
+            cur.executemany(
+                "INSERT INTO student_attempts (test_id, roll_no, section, student_name, answers, score) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                batch
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+def measure(engine, lookups: int, attempts: int, tests: int) -> dict:
+    """Time each hot-path query over random keys; returns latency percentiles in milliseconds."""
+    rng = random.Random(42)
+    classes = max(1, tests // 5)
+    queries = {
+        "attempt_by_test_roll_section": lambda db, i: db.query(models.StudentAttempt).filter(
+            models.StudentAttempt.test_id == i % tests + 1,
+            models.StudentAttempt.roll_no == str(i // tests),
+            models.StudentAttempt.section == "ABCD"[i % 4]
+        ).first(),
+        "active_test_by_class": lambda db, i: db.query(models.Test).filter(
+            models.Test.class_id == i % classes + 1,
+            models.Test.is_active == True
+        ).first(),
+        "questions_by_test": lambda db, i: db.query(models.Question).filter(
+            models.Question.test_id == i % tests + 1
+        ).all(),
+    }
+
+    results = {}
+    with Session(bind=engine) as db:
+        for name, query in queries.items():
+            timings = []
+            for _ in range(lookups):
+                key = rng.randrange(attempts)
+                start = time.perf_counter()
+                query(db, key)
+                timings.append((time.perf_counter() - start) * 1000)
+                db.expunge_all()
+            timings.sort()
+            results[name] = {
+                "p50_ms": round(statistics.median(timings), 3),
+                "p95_ms": round(timings[int(len(timings) * 0.95) - 1], 3),
+                "mean_ms": round(statistics.mean(timings), 3),
+            }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--attempts", type=int, default=1_000_000)
+    parser.add_argument("--tests", type=int, default=1000)
+    parser.add_argument("--questions-per-test", type=int, default=50)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        for index in HOT_PATH_INDEXES:
+            index.drop(bind=engine)
+
+        start = time.perf_counter()
+        seed(engine, args.attempts, args.tests, args.questions_per_test)
+        print(f"Seeded {args.attempts} attempts in {time.perf_counter() - start:.1f}s")
+
+        before = measure(engine, args.lookups, args.attempts, args.tests)
+
+        start = time.perf_counter()
+        for index in HOT_PATH_INDEXES:
+            index.create(bind=engine)
+        print(f"Built indexes in {time.perf_counter() - start:.1f}s")
+
+        after = measure(engine, args.lookups, args.attempts, args.tests)
+        engine.dispose()
+
+    print(f"\n{'query':32} {'before p50':>12} {'after p50':>12} {'speedup':>9}")
+    for name in before:
+        b, a = before[name]["p50_ms"], after[name]["p50_ms"]
+        print(f"{name:32} {b:10.3f}ms {a:10.3f}ms {b / a if a else float('inf'):8.1f}x")
+
+if __name__ == "__main__":
+    main()
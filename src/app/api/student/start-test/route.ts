@@ -19,17 +19,30 @@ export async function POST(req: NextRequest) {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          ...(req.headers.get("if-none-match")
+            ? { "If-None-Match": req.headers.get("if-none-match") as string }
+            : {}),
         },
         body: JSON.stringify(body),
       }
     )
 
+    const etag = response.headers.get("etag")
+    if (response.status === 304) {
+      return new NextResponse(null, {
+        status: 304,
+        headers: etag ? { ETag: etag } : {},
+      })
+    }
+
     if (!response.ok) {
       throw new Error("Failed to start test")
     }
 
     const data = await response.json()
-    return NextResponse.json(data)
+    return NextResponse.json(data, {
+      headers: etag ? { ETag: etag } : {},
+    })
   } catch (error) {
     return NextResponse.json(
       { error: "Failed to start test" },
@@ -7,6 +7,9 @@ export async function POST(req: NextRequest) {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        ...(req.headers.get("idempotency-key")
+          ? { "Idempotency-Key": req.headers.get("idempotency-key") as string }
+          : {}),
       },
       body: JSON.stringify(body),
     })
@@ -13,6 +13,7 @@ import {
   SelectTrigger,
   SelectValue,
 } from "@/components/ui/select"
+import { fetchTestPaper } from "@/lib/test-paper"
 
 export default function StudentEntry() {
   const [formData, setFormData] = useState({
@@ -37,23 +38,8 @@ export default function StudentEntry() {
     setLoading(true)
 
     try {
-      const response = await fetch(`/api/student/start-test?class_id=${formData.class_id}`, {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({
-          ...formData,
-        }),
-      })
-
-      if (!response.ok) {
-        const data = await response.json()
-        const errorMessage = data.error || data.detail || "Failed to start test"
-        throw new Error(errorMessage)
-      }
-
-      const data = await response.json()
+      // Kept with its ETag, so the test page revalidates instead of refetching
+      const data = await fetchTestPaper(formData)
       
       // Store student info in localStorage for test submission
       localStorage.setItem("student_info", JSON.stringify({
@@ -8,6 +8,7 @@ import { AlertCircle } from "lucide-react"
 import { QuestionCard } from "@/components/test/question-card"
 import { TestProgress } from "@/components/test/test-progress"
 import { getValidatedStudentInfo } from "@/lib/student-auth"
+import { clearTestPaper, fetchTestPaper } from "@/lib/test-paper"
 
 interface Question {
   id: number
@@ -30,6 +31,8 @@ export default function TestPage({ params }: { params: { testId: string } }) {
   const [error, setError] = useState<string | null>(null)
   const [loading, setLoading] = useState(true)
   const [submitting, setSubmitting] = useState(false)
+  // Reused on every retry so the backend records the submission only once
+  const [submissionKey] = useState(() => crypto.randomUUID())
   const router = useRouter()
 
   useEffect(() => {
@@ -58,26 +61,13 @@ export default function TestPage({ params }: { params: { testId: string } }) {
     try {
       const { class_id, roll_no, student_name, section } = getValidatedStudentInfo(true)
 
-      const response = await fetch(
-        `/api/student/start-test?class_id=${class_id}`,
-        {
-          method: "POST",
-          headers: {
-            "Content-Type": "application/json",
-          },
-          body: JSON.stringify({
-            roll_no,
-            student_name,
-            section,
-          }),
-        }
-      )
-
-      if (!response.ok) {
-        throw new Error("Failed to fetch test")
-      }
-
-      const data = await response.json()
+      // Answered with 304 on a refresh; the stored paper is reused
+      const data: TestData = await fetchTestPaper({
+        class_id: class_id as string,
+        roll_no,
+        student_name,
+        section,
+      })
       setTestData(data)
     } catch (err) {
       const message = err instanceof Error ? err.message : "Failed to load test"
@@ -107,6 +97,7 @@ export default function TestPage({ params }: { params: { testId: string } }) {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
+          "Idempotency-Key": submissionKey,
         },
         body: JSON.stringify({
           test_id: testData?.test_id,
@@ -123,6 +114,7 @@ export default function TestPage({ params }: { params: { testId: string } }) {
 
       const result = await response.json()
       localStorage.removeItem("student_info")
+      clearTestPaper()
       router.push(`/student/result/${testData?.test_id}`)
     } catch (err) {
       const message = err instanceof Error ? err.message : "Failed to submit test"
@@ -0,0 +1,67 @@
+interface StartTestRequest {
+  class_id: string
+  roll_no: string
+  student_name: string
+  section: string
+}
+
+interface StoredPaper {
+  key: string
+  etag: string
+  data: any
+}
+
+// Browsers do not revalidate POST responses, so the paper and its ETag are
+// kept here and sent back as If-None-Match; a 304 reuses the stored copy.
+const STORAGE_KEY = "test_paper"
+
+function paperKey({ class_id, roll_no, section }: StartTestRequest): string {
+  return JSON.stringify([class_id, roll_no, section])
+}
+
+function loadStoredPaper(key: string): StoredPaper | null {
+  try {
+    const stored: StoredPaper = JSON.parse(sessionStorage.getItem(STORAGE_KEY) || "null")
+    return stored && stored.key === key ? stored : null
+  } catch (err) {
+    return null
+  }
+}
+
+export async function fetchTestPaper(request: StartTestRequest): Promise<any> {
+  const key = paperKey(request)
+  const stored = loadStoredPaper(key)
+
+  const response = await fetch(`/api/student/start-test?class_id=${request.class_id}`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      ...(stored ? { "If-None-Match": stored.etag } : {}),
+    },
+    body: JSON.stringify({
+      roll_no: request.roll_no,
+      student_name: request.student_name,
+      section: request.section,
+    }),
+  })
+
+  if (response.status === 304 && stored) {
+    return stored.data
+  }
+
+  if (!response.ok) {
+    const data = await response.json().catch(() => ({}))
+    throw new Error(data.error || data.detail || "Failed to start test")
+  }
+
+  const data = await response.json()
+  const etag = response.headers.get("etag")
+  if (etag) {
+    sessionStorage.setItem(STORAGE_KEY, JSON.stringify({ key, etag, data }))
+  }
+  return data
+}
+
+export function clearTestPaper() {
+  sessionStorage.removeItem(STORAGE_KEY)
+}